@@ -1,37 +1,48 @@
-import csv
+import argparse
 import pandas as pd
-from tqdm import tqdm
 
-# Step 1: Load the clusters.tsv file and create a reverse lookup dictionary
-gene_to_family = {}
-with open('/stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/all_419_CDS.NR.clusters.csv', 'r') as f:
-    reader = csv.reader(f, delimiter=',')
-    for row in reader:
-        gene_family, gene = row
-        gene_to_family[gene] = gene_family
+# Rows of the presence/absence matrix and of the properties table processed at a time
+CHUNK_ROWS = 500000
 
-# Step 2: Load the presence_absence_matrix.csv file and determine the number of strains each gene family is present in
-presence_absence = pd.read_csv('/stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/all_419_CDS.NR.clusters.presenceabsence.csv', index_col=0)
-gene_family_strain_count = {}
+def load_gene_families(clusters_csv):
+    # Step 1: Load the gene family,gene clusters file as a gene -> family lookup table
+    gene_families = pd.read_csv(clusters_csv, header=None, names=['gene_family', 'gene'], dtype=str)
+    # A gene listed twice keeps its last family, as the old dictionary lookup did
+    return gene_families.drop_duplicates(subset='gene', keep='last')
 
-for gene_family in tqdm(presence_absence.index, desc="Processing presence/absence matrix"):
-    num_strains = presence_absence.loc[gene_family].sum()
-    gene_family_strain_count[gene_family] = num_strains
+def load_strain_counts(presence_absence_csv):
+    """Step 2: Count the strains each gene family is present in with one row-wise sum per chunk."""
+    counts = []
+    for chunk in pd.read_csv(presence_absence_csv, index_col=0, chunksize=CHUNK_ROWS):
+        # Reduce each chunk to a compact boolean matrix before summing across strains
+        present = chunk.to_numpy() > 0
+        counts.append(pd.Series(present.sum(axis=1), index=chunk.index.astype(str), name='num_strains'))
+    strain_counts = pd.concat(counts)
+    return strain_counts[~strain_counts.index.duplicated(keep='last')]
 
-# Step 3: Load the ECOR_sequenceproperties.csv file and update it with the number of strains
-updated_rows = []
-with open('cleaned_all_419_seq_properties.csv', 'r') as f:
-    reader = csv.reader(f)
-    for row in tqdm(reader, desc="Updating sequence properties"):
-        gene, property_type, value = row
-        gene_family = gene_to_family.get(gene)
-        if gene_family:
-            num_strains = gene_family_strain_count[gene_family]
-            updated_rows.append([gene, property_type, value, num_strains])
+def add_gene_frequency(clusters_csv, presence_absence_csv, properties_csv, output_csv):
+    gene_families = load_gene_families(clusters_csv)
+    strain_counts = load_strain_counts(presence_absence_csv)
+    families = gene_families.merge(strain_counts, left_on='gene_family', right_index=True, how='inner')[['gene', 'num_strains']]
 
-# Step 4: Write the updated information to a new CSV file without a header
-with open('cleaned_all_419_seq_properties_w_freq.csv', 'w', newline='') as f:
-    writer = csv.writer(f)
-    writer.writerows(updated_rows)
+    # Step 3: Join the sequence properties with the strain counts, one chunk of rows at a time
+    num_rows = 0
+    with open(output_csv, 'w', newline='') as output:
+        for chunk in pd.read_csv(properties_csv, header=None, names=['gene', 'property_type', 'value'], dtype=str,
+                                 keep_default_na=False, chunksize=CHUNK_ROWS):
+            updated = chunk.merge(families, on='gene', how='inner')
+            # Step 4: Write the updated information without a header
+            updated.to_csv(output, header=False, index=False, lineterminator='\r\n')
+            num_rows += len(updated)
+    return num_rows
 
-print("Updated file has been written to 'cleaned_all_419_seq_properties_w_freq.csv'.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add the number of strains each gene's family is present in to a seq_properties CSV.")
+    parser.add_argument('clusters_csv', help="gene_family,gene CSV (e.g. all_419_CDS.NR.clusters.csv)")
+    parser.add_argument('presence_absence_csv', help="Gene family x strain presence/absence matrix CSV")
+    parser.add_argument('properties_csv', help="Headerless gene,property,value CSV (e.g. cleaned_all_419_seq_properties.csv)")
+    parser.add_argument('output_csv', help="Output CSV with a fourth num_strains column")
+    args = parser.parse_args()
+
+    num_rows = add_gene_frequency(args.clusters_csv, args.presence_absence_csv, args.properties_csv, args.output_csv)
+    print(f"Updated file has been written to '{args.output_csv}' ({num_rows} rows).")
@@ -0,0 +1,125 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from export_seq_properties import FEATURES, long_to_wide, read_seq_properties
+
+# Define the base directory containing all bacterial species folders
+base_dir = "/stor/scratch/Ochman/kristen/pangenome/all_bacterial_species"
+
+# Conservation classes used by the R analyses: cloud <= 5% of strains, core >= 95%, shell in between
+CONSERVATION_BINS = ['cloud', 'shell', 'core']
+SUMMARY_STATISTICS = ['count', 'mean', 'median', 'std', 'min', 'max']
+
+# One schema for every partition, so species with different or missing properties still read as one dataset
+DATASET_SCHEMA = pa.schema([('gene', pa.dictionary(pa.int32(), pa.string()))] +
+                           [(feature, pa.float64()) for feature in FEATURES] +
+                           [('conservation_bin', pa.dictionary(pa.int8(), pa.string())), ('species', pa.string())])
+PARTITIONING = ds.partitioning(pa.schema([('species', pa.string())]), flavor='hive')
+
+def species_files(species_path):
+    species = os.path.basename(os.path.normpath(species_path))
+    output_dir = os.path.join(species_path, "rep_seq_properties")
+    return (os.path.join(output_dir, f"{species}_seq_properties.csv"),
+            os.path.join(output_dir, f"{species}_seq_properties.parquet"),
+            os.path.join(output_dir, f"{species}_conservation.csv"))
+
+def conservation_bins(conservation):
+    values = conservation.to_numpy(dtype=np.float64, na_value=np.nan)
+    # Genes without a conservation percentage get no bin (NaN)
+    labels = np.select([values <= 0.05, values >= 0.95, values > 0.05], ['cloud', 'core', 'shell'], default=None)
+    return pd.Categorical(labels, categories=CONSERVATION_BINS)
+
+def load_species(species_path):
+    """Wide properties table of one species joined with its conservation percentage on the representative ID."""
+    species = os.path.basename(os.path.normpath(species_path))
+    properties_csv, properties_parquet, conservation_csv = species_files(species_path)
+    # Reuse the columnar export when it is at least as new as the CSV
+    if os.path.isfile(properties_parquet) and os.path.getmtime(properties_parquet) >= os.path.getmtime(properties_csv):
+        wide_df = read_seq_properties(properties_parquet)
+    else:
+        wide_df = long_to_wide(properties_csv, species)
+
+    if os.path.isfile(conservation_csv):
+        conservation = pd.read_csv(conservation_csv, header=None, names=['gene', 'feature', 'conservation_percentage'],
+                                   usecols=['gene', 'conservation_percentage'], dtype={'gene': str})
+        conservation = conservation.drop_duplicates(subset='gene', keep='last')
+        # conservation.csv wins over a conservation_percentage already concatenated into seq_properties.csv
+        wide_df = wide_df.drop(columns='conservation_percentage', errors='ignore')
+        wide_df['gene'] = wide_df['gene'].astype(str)
+        wide_df = wide_df.merge(conservation, on='gene', how='left')
+        wide_df['gene'] = wide_df['gene'].astype('category')
+    # Exports written before every feature was declared may lack columns or store counts as integers
+    wide_df[FEATURES] = wide_df.reindex(columns=FEATURES).astype('float64')
+    wide_df['conservation_bin'] = conservation_bins(wide_df['conservation_percentage'])
+    return wide_df
+
+def summarize(wide_df, species):
+    """Count, mean, median, std, min and max of every property, for all genes and per conservation bin."""
+    features = [column for column in wide_df.columns if column not in ('species', 'gene', 'conservation_bin')]
+    values = wide_df[features].astype('float64')
+    groups = [('all', values)] + [(name, values[wide_df['conservation_bin'] == name]) for name in CONSERVATION_BINS]
+    summaries = []
+    for conservation_bin, group in groups:
+        stats = group.agg(SUMMARY_STATISTICS).T
+        stats.insert(0, 'conservation_bin', conservation_bin)
+        stats.insert(0, 'species', species)
+        summaries.append(stats.rename_axis('feature').reset_index())
+    summary = pd.concat(summaries, ignore_index=True)
+    summary['count'] = summary['count'].astype('int64')
+    return summary[['species', 'conservation_bin', 'feature'] + SUMMARY_STATISTICS]
+
+def aggregate_one(species_path, output_dir):
+    """Write one species' partition of the dataset and return its summary statistics."""
+    species = os.path.basename(os.path.normpath(species_path))
+    wide_df = load_species(species_path)
+
+    # Hive-style partition: the species is stored in the directory name, not in the file
+    wide_df['species'] = species
+    table = pa.Table.from_pandas(wide_df, schema=DATASET_SCHEMA, preserve_index=False)
+    pq.write_to_dataset(table, output_dir, partition_cols=['species'], schema=DATASET_SCHEMA,
+                        basename_template='part-{i}.parquet', existing_data_behavior='delete_matching', compression='zstd')
+    return summarize(wide_df, species)
+
+def find_species(base_dir, selected=None):
+    """List species directories that have a seq_properties CSV, optionally restricted to the selected names."""
+    species = sorted(entry.name for entry in os.scandir(base_dir)
+                     if entry.is_dir() and os.path.isfile(species_files(entry.path)[0]))
+    if selected:
+        species = [name for name in species if name in selected]
+    return species
+
+def aggregate_species(base_dir, output_dir, summary_csv, workers=None, selected=None):
+    species_names = find_species(base_dir, selected)
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        summaries = list(executor.map(aggregate_one, [os.path.join(base_dir, species) for species in species_names],
+                                      [output_dir] * len(species_names)))
+    summary = pd.concat(summaries, ignore_index=True) if summaries else pd.DataFrame(columns=['species', 'conservation_bin', 'feature'] + SUMMARY_STATISTICS)
+    summary.to_csv(summary_csv, index=False)
+    return species_names, summary
+
+def read_pangenome_properties(dataset_dir, columns=None, species=None):
+    """Load the aggregated dataset, reading only the requested columns and species partitions."""
+    dataset = ds.dataset(dataset_dir, schema=DATASET_SCHEMA, format='parquet', partitioning=PARTITIONING)
+    species_filter = ds.field('species').isin(list(species)) if species else None
+    wide_df = dataset.to_table(columns=columns, filter=species_filter).to_pandas()
+    if 'conservation_bin' in wide_df.columns:
+        wide_df['conservation_bin'] = wide_df['conservation_bin'].cat.set_categories(CONSERVATION_BINS)
+    return wide_df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate every species' seq_properties and conservation into one partitioned Parquet dataset.")
+    parser.add_argument('--base-dir', default=base_dir, help="Directory containing one folder per bacterial species")
+    parser.add_argument('--output', default='pangenome_properties', help="Dataset directory (one species=<name> partition per species)")
+    parser.add_argument('--summary', default='pangenome_properties_summary.csv', help="CSV of per-species, per-conservation-bin summary statistics")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of species read at once")
+    parser.add_argument('--species', nargs='+', help="Only aggregate these species")
+    args = parser.parse_args()
+
+    species_names, summary = aggregate_species(args.base_dir, args.output, args.summary, args.workers, args.species)
+    print(f"Wrote {len(species_names)} species partitions to {args.output} and {len(summary)} summary rows to {args.summary}")
@@ -1,9 +1,21 @@
 #!/bin/bash
 
 # Usage: ./seqprop_pipeline_each_species.sh
+# Runs the species one after another; run_all_species.py runs the same stages for many species in parallel
 
 BASE_DIR="/stor/scratch/Ochman/kristen/pangenome/all_bacterial_species/"
 
+# Record wall/CPU time, peak RSS, bytes read/written and the sequence count of every stage for every species
+# in one JSON-lines log (find the slowest stages and species with: python stage_metrics.py summary --log <log>);
+# set PROFILE_DIR to also write cProfile dumps of the Python stages
+METRICS_LOG="${METRICS_LOG:-${BASE_DIR}seqprop_stage_metrics.jsonl}"
+stage() {
+    local name=$1
+    shift
+    python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/stage_metrics.py run --log "$METRICS_LOG" --species "$species" \
+        --stage "$name" --sequences "$num_sequences" ${PROFILE_DIR:+--profile-dir "$PROFILE_DIR"} "$@"
+}
+
 # Loop through each species directory
 for species_dir in "$BASE_DIR"/*; do
     species=$(basename "$species_dir")
@@ -13,63 +25,66 @@ for species_dir in "$BASE_DIR"/*; do
 
     # Check if both the CDS and protein fasta files exist
     if [[ -f "$cds_fasta" && -f "$protein_fasta" ]]; then
+        num_sequences=$(grep -c '^>' "$protein_fasta")
+
         # Linearize the CDS fasta
         linear_cds_fasta="$species_dir/linear_rep_${species}_cds.fna"
-        awk '/^>/ {if (seq) print seq; print; seq=""; next} {seq=seq$0} END {if (seq) print seq}' "$cds_fasta" > "$linear_cds_fasta"
+        stage linearize_cds --input "$cds_fasta" --output "$linear_cds_fasta" --stdout \
+            -- awk '/^>/ {if (seq) print seq; print; seq=""; next} {seq=seq$0} END {if (seq) print seq}' "$cds_fasta"
 
         # Linearize the protein fasta
         linear_protein_fasta="$species_dir/linear_rep_${species}_proteins.faa"
-        awk '/^>/ {if (seq) print seq; print; seq=""; next} {seq=seq$0} END {if (seq) print seq}' "$protein_fasta" > "$linear_protein_fasta"
+        stage linearize_proteins --input "$protein_fasta" --output "$linear_protein_fasta" --stdout \
+            -- awk '/^>/ {if (seq) print seq; print; seq=""; next} {seq=seq$0} END {if (seq) print seq}' "$protein_fasta"
 
         # Define the output directory for sequence properties
         output_dir="$species_dir/rep_seq_properties"
         mkdir -p "$output_dir"
 
         # Calculate sequence properties
-        # Length calculation
-        awk -F '\n' '{OFS=","; getline seq; match($1, /^>(.*)/, arr); print arr[1], "length", length(seq)}' "$linear_cds_fasta" > "${output_dir}/${alias}_length.csv"
-
-        # GC content
-        awk 'BEGIN {OFS=","} /^>/ {if (seq) {gc_content = (gc_count / total_length) * 100; if (header_id != "") print header_id, "GC", gc_content}; seq = ""; gc_count = 0; total_length = 0; match($0, /^>(.*)/, arr); header_id = arr[1]; next} {seq = seq $0; total_length += length($0); gc_count += gsub(/[GCgc]/, "")} END {if (seq && header_id != "") {gc_content = (gc_count / total_length) * 100; print header_id, "GC", gc_content}}' "$linear_cds_fasta" > "${output_dir}/${alias}_gc.csv"
-
-        # GC content at 3rd codon position
-        awk 'BEGIN {OFS=","} /^>/ {if (NR > 1 && seq) {gc_3rd_content = (third_gc_count / (total_length / 3)) * 100; if (header_id != "") print header_id, "GC_3rd", gc_3rd_content}; seq = ""; third_gc_count = 0; total_length = 0; match($0, /^>(.*)/, arr); header_id = arr[1]; next} {seq = seq $0; total_length += length($0); for (i = 3; i <= length($0); i += 3) {if (substr($0, i, 1) ~ /[GCgc]/) third_gc_count++}} END {if (seq && header_id != "") {gc_3rd_content = (third_gc_count / (total_length / 3)) * 100; print header_id, "GC_3rd", gc_3rd_content}}' "$linear_cds_fasta" > "${output_dir}/${alias}_gc_3rd.csv"
-
-        # Polar amino acid content
-        awk 'BEGIN {OFS=","} /^>/ {if (NR > 1) {polar_content = (polar_count / total_length) * 100; print identifier, "polarAA", polar_content} identifier = substr($1, 2); total_length = 0; polar_count = 0; next} {total_length += length($0); polar_count += gsub(/[STYECQNHKR]/, "", $0)} END {if (total_length > 0) {polar_content = (polar_count / total_length) * 100; print identifier, "polarAA", polar_content}}' "$linear_protein_fasta" > "${output_dir}/${alias}_polar_aa.csv"
-
-        # Hydrophobic amino acid content
-        awk 'BEGIN {OFS=","} /^>/ {if (NR > 1) {hydrophobic_content = (hydrophobic_count / total_length) * 100; print identifier, "hydrophobicAA", hydrophobic_content} identifier = substr($1, 2); total_length = 0; hydrophobic_count = 0; next} {total_length += length($0); hydrophobic_count += gsub(/[ACFGILMPVWY]/, "", $0)} END {if (total_length > 0) {hydrophobic_content = (hydrophobic_count / total_length) * 100; print identifier, "hydrophobicAA", hydrophobic_content}}' "$linear_protein_fasta" > "${output_dir}/${alias}_hydrophobic_aa.csv"
-
-        # Metabolic costs
-        awk 'BEGIN {OFS=","} NR==FNR {costs[$1]=$2; next} /^>/ {if (NR > FNR + 1 && total_length > 0) {print identifier, "metabol", total_cost / total_length} identifier = substr($1, 2); total_length = 0; total_cost = 0; next} {for (i = 1; i <= length($0); i++) {aa = substr($0, i, 1); if (aa in costs) {total_cost += costs[aa]}} total_length += length($0)} END {if (total_length > 0) {print identifier, "metabol", total_cost / total_length}}' /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/AA_metabolic_costs.txt "$linear_protein_fasta" > "${output_dir}/${alias}_metabol.csv"
-
-        # CAI calculation
-        /stor/work/Ochman/hassan/tools/EMBOSS-6.6.0/emboss/cai -seqall "$linear_cds_fasta" -cfile /stor/work/Ochman/hassan/tools/EMBOSS-6.6.0/emboss/data/CODONS/Eecoli.cut -outfile "${output_dir}/${alias}.cai"
-        awk '{print $2, "cai", $4}' OFS="," "${output_dir}/${alias}.cai" > "${output_dir}/${alias}_cai.csv"
+        # Length, GC content, GC at 3rd codon position, polar/hydrophobic amino acid content and metabolic costs
+        # are all computed in one pass over each FASTA
+        stage seqprops --input "$linear_cds_fasta" --input "$linear_protein_fasta" \
+            --output "${output_dir}/${alias}_length.csv" --output "${output_dir}/${alias}_gc.csv" --output "${output_dir}/${alias}_gc_3rd.csv" \
+            --output "${output_dir}/${alias}_polar_aa.csv" --output "${output_dir}/${alias}_hydrophobic_aa.csv" --output "${output_dir}/${alias}_metabol.csv" \
+            -- python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calculate_seqprops.py "$linear_cds_fasta" "$linear_protein_fasta" "$alias" --output-dir "$output_dir"
+
+        # External predictors (IUPred3, Phobius), run concurrently; Phobius over FASTA shards, IUPred3 on the whole FASTA
+        # (it scores the file as one sequence, so sharding would change its output);
+        # tools whose inputs are unchanged since the last run (rep_seq_properties/manifest.json) are skipped
+        stage predictors --input "$linear_protein_fasta" \
+            --output "${output_dir}/${alias}_iupred3_output.txt" --output "${output_dir}/${alias}_tm.phobius" \
+            -- python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/run_predictors.py "$linear_protein_fasta" "$alias" --output-dir "$output_dir" --cache
+
+        # CAI calculation against the EMBOSS E. coli codon usage table (computed in Python, no EMBOSS cai run)
+        stage cai --input "$linear_cds_fasta" --output "${output_dir}/${alias}_cai.csv" \
+            -- python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calculate_cai.py "$linear_cds_fasta" "${output_dir}/${alias}_cai.csv"
 
         # Instability calculation
-        python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calculate_instability.py "$linear_protein_fasta" "${output_dir}/${alias}_instability.csv"
+        stage instability --input "$linear_protein_fasta" --output "${output_dir}/${alias}_instability.csv" \
+            -- python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calculate_instability.py "$linear_protein_fasta" "${output_dir}/${alias}_instability.csv"
 
         # Intrinsic structural disorder calculation
-        python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/iupred3/iupred3.py "$linear_protein_fasta" long > "${output_dir}/${alias}_iupred3_output.txt"
-        python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calculate_disorder.py "$linear_protein_fasta" "${output_dir}/${alias}_iupred3_output.txt" "${output_dir}/${alias}_disorder.csv"
-
-        # Transmembrane domain calculation
-        /stor/work/Ochman/hassan/tools/phobius/phobius.pl -short "$linear_protein_fasta" > "${output_dir}/${alias}_tm.phobius"
-        python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/tm_to_csv.py "${output_dir}/${alias}_tm.phobius" "${output_dir}/${alias}_tm.csv"
+        stage disorder --input "$linear_protein_fasta" --input "${output_dir}/${alias}_iupred3_output.txt" --output "${output_dir}/${alias}_disorder.csv" \
+            -- python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calculate_disorder.py "$linear_protein_fasta" "${output_dir}/${alias}_iupred3_output.txt" "${output_dir}/${alias}_disorder.csv"
 
-        # Transmembrane coverage calculation
-        python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calculate_tm_coverage.py "${output_dir}/${alias}_tm.phobius" "${output_dir}/${alias}_length.csv" "${output_dir}/${alias}_tm_coverage.csv"
-
-        # Signal peptide presence/absence
-        python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/sp_to_csv.py "${output_dir}/${alias}_tm.phobius" "${output_dir}/${alias}_sp.csv"
+        # Transmembrane domain, transmembrane coverage and signal peptide presence/absence (one pass over the Phobius output)
+        stage phobius_csv --input "${output_dir}/${alias}_tm.phobius" --input "${output_dir}/${alias}_length.csv" \
+            --output "${output_dir}/${alias}_tm.csv" --output "${output_dir}/${alias}_sp.csv" --output "${output_dir}/${alias}_tm_coverage.csv" \
+            -- python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/parse_phobius.py "${output_dir}/${alias}_tm.phobius" \
+            --tm "${output_dir}/${alias}_tm.csv" --sp "${output_dir}/${alias}_sp.csv" \
+            --tm-coverage "${output_dir}/${alias}_tm_coverage.csv" --lengths "${output_dir}/${alias}_length.csv"
 
         # Amino acid composition bias calculation
-        Rscript /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calc_aa_comp_bias.R "$linear_protein_fasta" "${output_dir}/${alias}_aa_comp_bias.csv"
+        stage aa_comp_bias --input "$linear_protein_fasta" --output "${output_dir}/${alias}_aa_comp_bias.csv" \
+            -- Rscript /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/calc_aa_comp_bias.R "$linear_protein_fasta" "${output_dir}/${alias}_aa_comp_bias.csv"
 
         # Concatenate all CSV files into one
-        cat "${output_dir}/${alias}"_*.csv > "${output_dir}/${alias}_seq_properties.csv"
+        stage concatenate --output "${output_dir}/${alias}_seq_properties.csv" --stdout -- cat "${output_dir}/${alias}"_*.csv
+
+        # Export a wide, typed columnar copy (one column per property) for faster downstream loading
+        stage export --input "${output_dir}/${alias}_seq_properties.csv" --output "${output_dir}/${alias}_seq_properties.parquet" \
+            -- python /stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/export_seq_properties.py "${output_dir}/${alias}_seq_properties.csv" --species "$species"
 
     fi
 done
@@ -0,0 +1,130 @@
+import argparse
+import csv
+import math
+import numpy as np
+from calculate_seqprops import encode_batch, segment_sums, iter_batches
+from fasta_io import record_id
+
+# EMBOSS codon usage table of highly expressed E. coli genes used as the CAI reference set
+CAI_CODON_TABLE = "/stor/work/Ochman/hassan/tools/EMBOSS-6.6.0/emboss/data/CODONS/Eecoli.cut"
+
+# Codon index = 16 * first + 4 * second + third base, with A, C, G, T (or U) = 0, 1, 2, 3
+BASES = b'ACGT'
+NUM_CODONS = 64
+
+def base_codes():
+    """Build a 256-entry lookup table from nucleotide bytes to 0-3, or -1 for anything else."""
+    table = np.full(256, -1, dtype=np.int8)
+    for code, base in enumerate(BASES):
+        table[base] = code
+        table[ord(chr(base).lower())] = code
+    table[ord('U')] = table[ord('u')] = BASES.index(b'T')
+    return table
+
+BASE_CODES = base_codes()
+
+def codon_index(codon):
+    codes = BASE_CODES[np.frombuffer(codon.encode(), dtype=np.uint8)]
+    return int(codes[0]) * 16 + int(codes[1]) * 4 + int(codes[2])
+
+def load_codon_weights(cut_path):
+    """Parse an EMBOSS .cut codon usage table into a 64-entry array of relative adaptiveness (w) values.
+
+    Like EMBOSS, w is a codon's count divided by the count of the most used
+    codon for the same amino acid, so Met and Trp always get w = 1. Stop
+    codons and codons never used in the reference genes get w = 0.
+    """
+    amino_acids = {}
+    counts = np.zeros(NUM_CODONS, dtype=np.float64)
+    frequencies = np.zeros(NUM_CODONS, dtype=np.float64)
+    with open(cut_path, 'r') as file:
+        for line in file:
+            # Columns: Codon AA Fraction Frequency Number
+            parts = line.split()
+            if len(parts) < 5 or line.startswith('#') or len(parts[0]) != 3:
+                continue
+            index = codon_index(parts[0].upper())
+            amino_acids[index] = parts[1]
+            frequencies[index] = float(parts[3])
+            counts[index] = float(parts[4])
+    if len(amino_acids) != NUM_CODONS:
+        raise ValueError(f"{cut_path}: expected {NUM_CODONS} codons, found {len(amino_acids)}")
+    # Some tables only carry frequencies per 1000 codons, which give the same ratios
+    if not counts.any():
+        counts = frequencies
+
+    weights = np.zeros(NUM_CODONS, dtype=np.float64)
+    for amino_acid in set(amino_acids.values()) - {'*', 'End', 'Stop'}:
+        synonymous = [index for index, residue in amino_acids.items() if residue == amino_acid]
+        highest = counts[synonymous].max()
+        if highest > 0:
+            weights[synonymous] = counts[synonymous] / highest
+    return weights
+
+def encode_codons(sequences):
+    """Encode a batch of CDSs as one array of codon indices (-1 for codons with non-ACGT bases) plus record boundaries.
+
+    Only whole codons are read; a trailing partial codon is ignored.
+    """
+    encoded, lengths, _ = encode_batch(sequences)
+    codes = BASE_CODES[encoded].astype(np.int16)
+    num_codons = lengths // 3
+    codon_bounds = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(num_codons, out=codon_bounds[1:])
+
+    # Offset of every codon's first base in the concatenated batch
+    sequence_starts = np.zeros(len(sequences), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=sequence_starts[1:])
+    codon_numbers = np.arange(codon_bounds[-1], dtype=np.int64) - np.repeat(codon_bounds[:-1], num_codons)
+    starts = np.repeat(sequence_starts, num_codons) + codon_numbers * 3
+
+    first, second, third = codes[starts], codes[starts + 1], codes[starts + 2]
+    codons = first * 16 + second * 4 + third
+    codons[(first < 0) | (second < 0) | (third < 0)] = -1
+    return codons, codon_bounds
+
+def cai_batch(sequences, log_weights):
+    """Return the CAI of every CDS in a batch as the geometric mean of its codons' w values.
+
+    As in EMBOSS cai, codons with w = 0 (stops and codons unused in the
+    reference genes) are skipped rather than scored, while Met and Trp count
+    with w = 1. Codons with ambiguous bases are skipped too; CDSs with no
+    scorable codon get NaN.
+    """
+    codons, codon_bounds = encode_codons(sequences)
+    # Codons with non-ACGT bases (-1) pick up the NaN appended at index 64
+    codon_logs = np.append(log_weights, np.nan)[codons]
+    scored = ~np.isnan(codon_logs)
+    log_sums = segment_sums(np.where(scored, codon_logs, 0.0), codon_bounds)
+    num_scored = segment_sums(scored, codon_bounds)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.exp(log_sums / num_scored)
+
+def calculate_cai(cds_fasta, output_csv, codon_table=CAI_CODON_TABLE):
+    """Write an id,cai,value row for every CDS, formatted like the EMBOSS cai output ("%.3f").
+
+    A CDS with no scorable codon gets NA, so the table keeps one row per input record.
+    """
+    weights = load_codon_weights(codon_table)
+    with np.errstate(divide='ignore'):
+        log_weights = np.where(weights > 0, np.log(weights), np.nan)
+
+    count = 0
+    with open(output_csv, 'w', newline='') as handle:
+        writer = csv.writer(handle, lineterminator='\n')
+        for batch in iter_batches(cds_fasta):
+            values = cai_batch([sequence for _, sequence in batch], log_weights)
+            for (header, _), value in zip(batch, values.tolist()):
+                writer.writerow([record_id(header), 'cai', 'NA' if math.isnan(value) else '%.3f' % value])
+            count += len(batch)
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculate the codon adaptation index (CAI) of every CDS against an EMBOSS codon usage table.")
+    parser.add_argument('cds_fasta', help="CDS (nucleotide) FASTA file")
+    parser.add_argument('output_csv', help="Output CSV file (id,cai,value)")
+    parser.add_argument('--codon-table', default=CAI_CODON_TABLE, help="EMBOSS .cut codon usage table of the reference genes")
+    args = parser.parse_args()
+
+    num_cds = calculate_cai(args.cds_fasta, args.output_csv, args.codon_table)
+    print(f"Calculated CAI for {num_cds} CDSs.")
@@ -1,50 +1,67 @@
 import csv
+import numpy as np
 from tqdm import tqdm
 import sys
+from fasta_io import read_fasta, record_id
 
-def parse_fasta_file(fasta_path):
-    sequences = {}
-    with open(fasta_path, 'r') as file:
-        current_header = None
+def parse_fasta_lengths(fasta_path):
+    """Return protein IDs and their sequence lengths without keeping the sequences."""
+    lengths = {}
+    for header, sequence in read_fasta(fasta_path):
+        lengths[record_id(header)] = len(sequence)
+    return list(lengths), np.fromiter(lengths.values(), dtype=np.int64, count=len(lengths))
+
+def parse_iupred_scores(iupred_path, lengths):
+    """Stream IUPred scores into a preallocated float32 array sized for the proteins' total residue count.
+
+    Any scores beyond that count are counted but not stored, as they cannot
+    be matched to a residue. Progress advances once per protein, not per residue.
+    """
+    ends = np.cumsum(lengths).tolist()
+    expected_count = ends[-1] if ends else 0
+    scores = np.empty(expected_count, dtype=np.float32)
+    num_scores = 0
+    completed = 0
+    with open(iupred_path, 'r') as file, tqdm(total=len(ends), desc="Processing IUPred output", unit='proteins') as progress:
+        next_end = ends[0] if ends else float('inf')
         for line in file:
-            line = line.strip()
-            if line.startswith('>'):
-                current_header = line.split()[0][1:]
-                sequences[current_header] = []
-            else:
-                sequences[current_header].append(line)
-    for key in sequences:
-        sequences[key] = ''.join(sequences[key])
-    return sequences
+            if line and line[0].isdigit():
+                parts = line.split()
+                if len(parts) == 3:
+                    if num_scores < expected_count:
+                        scores[num_scores] = float(parts[2])
+                    num_scores += 1
+                    if num_scores >= next_end:
+                        # Also steps over zero-length proteins that end at the same residue
+                        finished = completed
+                        while completed < len(ends) and ends[completed] <= num_scores:
+                            completed += 1
+                        progress.update(completed - finished)
+                        next_end = ends[completed] if completed < len(ends) else float('inf')
+    return scores[:min(num_scores, expected_count)], num_scores
 
-def parse_iupred_output(iupred_path):
-    with open(iupred_path, 'r') as file:
-        data = file.read().splitlines()
+def average_disorder_by_offsets(proteins, lengths, scores):
+    """Per-protein mean disorder from cumulative sums over the sequence-length offsets.
 
-    scores = []
-    for line in tqdm(data, desc="Processing IUPred output"):
-        if line and line[0].isdigit():
-            parts = line.split()
-            if len(parts) == 3:
-                score = float(parts[2])
-                scores.append(score)
-    return scores
+    Proteins that run past the end of the scores average what is left and
+    get a warning; later ones score 0.
+    """
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    available = len(scores)
 
-def calculate_average_disorder(sequences, scores):
-    average_disorder = {}
-    score_index = 0
-    for protein, sequence in tqdm(sequences.items(), desc="Calculating averages"):
-        protein_scores = []
-        for residue in sequence:
-            if score_index < len(scores):
-                protein_scores.append(scores[score_index])
-                score_index += 1
-            else:
-                print(f"Warning: Ran out of scores before matching all residues of {protein}")
-                break
-        avg_score = sum(protein_scores) / len(protein_scores) if protein_scores else 0
-        average_disorder[protein] = avg_score
-    return average_disorder
+    totals = np.zeros(available + 1, dtype=np.float64)
+    np.cumsum(scores, dtype=np.float64, out=totals[1:])
+    clipped_starts = np.minimum(starts, available)
+    clipped_ends = np.minimum(ends, available)
+    counts = clipped_ends - clipped_starts
+    sums = totals[clipped_ends] - totals[clipped_starts]
+    averages = np.divide(sums, counts, out=np.zeros(len(lengths), dtype=np.float64), where=counts > 0)
+
+    for index in np.flatnonzero((ends > available) & (lengths > 0)):
+        print(f"Warning: Ran out of scores before matching all residues of {proteins[index]}")
+    # Proteins without any scores get an integer 0
+    return {protein: average if count else 0 for protein, average, count in zip(proteins, averages.tolist(), counts.tolist())}
 
 def write_to_csv(output_path, average_disorder_scores):
     with open(output_path, 'w', newline='') as csvfile:
@@ -52,24 +69,23 @@ def write_to_csv(output_path, average_disorder_scores):
         for protein, avg_score in tqdm(average_disorder_scores.items(), desc="Writing to CSV"):
             writer.writerow([protein, 'disorder', avg_score])
 
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python calculate_disorder.py <fasta_file_path> <iupred_output_path> <output_csv_path>")
-        sys.exit(1)
-
-    fasta_file_path = sys.argv[1]
-    iupred_output_path = sys.argv[2]
-    output_csv_path = sys.argv[3]
-
-    sequences = parse_fasta_file(fasta_file_path)
-    print(f"Parsed {len(sequences)} sequences from FASTA file.")
+def calculate_disorder(fasta_file_path, iupred_output_path, output_csv_path):
+    """Write the mean IUPred3 disorder score of every protein to output_csv_path."""
+    proteins, lengths = parse_fasta_lengths(fasta_file_path)
+    print(f"Parsed {len(proteins)} sequences from FASTA file.")
 
-    iupred_scores = parse_iupred_output(iupred_output_path)
-    print(f"Parsed {len(iupred_scores)} scores from IUPred output.")
+    iupred_scores, num_scores = parse_iupred_scores(iupred_output_path, lengths)
+    print(f"Parsed {num_scores} scores from IUPred output.")
 
-    average_disorder_scores = calculate_average_disorder(sequences, iupred_scores)
+    average_disorder_scores = average_disorder_by_offsets(proteins, lengths, iupred_scores)
     print(f"Calculated average disorder scores for {len(average_disorder_scores)} proteins.")
 
     write_to_csv(output_csv_path, average_disorder_scores)
     print(f"Results written to {output_csv_path}")
 
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python calculate_disorder.py <fasta_file_path> <iupred_output_path> <output_csv_path>")
+        sys.exit(1)
+
+    calculate_disorder(sys.argv[1], sys.argv[2], sys.argv[3])
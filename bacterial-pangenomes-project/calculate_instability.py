@@ -1,19 +1,47 @@
 import csv
 import sys
-from Bio import SeqIO
+import numpy as np
 from Bio.SeqUtils import ProtParamData
-from tqdm import tqdm  # For the progress bar
+from fasta_io import read_fasta, record_id, fasta_progress
+
+# Standard amino acids in DIWV order; every other residue maps to the extra "unknown" class
+STANDARD_AAS = ''.join(sorted(ProtParamData.DIWV))
+UNKNOWN_CODE = len(STANDARD_AAS)
+
+# Number of proteins scored together by instability_index_batch
+CHUNK_SIZE = 10000
+
+# Number of similar-length proteins summed side by side within a chunk
+GROUP_SIZE = 256
+
+def build_diwv_matrix():
+    """Build a 21x21 dipeptide weight matrix with zero weight for any pair involving an unknown residue."""
+    matrix = np.zeros((UNKNOWN_CODE + 1, UNKNOWN_CODE + 1), dtype=np.float64)
+    for i, this in enumerate(STANDARD_AAS):
+        for j, next in enumerate(STANDARD_AAS):
+            matrix[i, j] = ProtParamData.DIWV[this][next]
+    return matrix
+
+def build_residue_codes():
+    """Build a 256-entry lookup table mapping residue bytes to DIWV matrix indices."""
+    codes = np.full(256, UNKNOWN_CODE, dtype=np.uint8)
+    for i, aa in enumerate(STANDARD_AAS):
+        codes[ord(aa)] = i
+    return codes
+
+DIWV_MATRIX = build_diwv_matrix()
+RESIDUE_CODES = build_residue_codes()
 
 def instability_index(seq):
     """Calculate the instability index according to Guruprasad et al 1990."""
     index = ProtParamData.DIWV  # Dipeptide instability weights
     score = 0.0
     length = len(seq)
-    
+
     # Loop through each dipeptide and skip non-standard amino acids
     for i in range(length - 1):
         this, next = seq[i:i + 2]
-        
+
         # Check if both amino acids are in the standard 20 amino acids
         if this in index and next in index[this]:
             dipeptide_value = index[this][next]
@@ -24,26 +52,67 @@ def instability_index(seq):
 
     return (10.0 / length) * score
 
+def instability_index_batch(seqs):
+    """Calculate the instability index for a list of sequences at once.
+
+    Gives the same values as instability_index(), including skipping
+    dipeptides that contain a non-standard amino acid.
+    """
+    lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+    if (lengths == 0).any():
+        raise ZeroDivisionError("Cannot calculate the instability index of an empty sequence")
+
+    # One byte per residue so positions line up with sequence offsets
+    encoded = RESIDUE_CODES[np.frombuffer(''.join(seqs).encode('ascii', errors='replace'), dtype=np.uint8)]
+    starts = np.zeros(len(seqs), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+
+    # Weight of every adjacent residue pair in the concatenated chunk
+    weights = DIWV_MATRIX[encoded[:-1], encoded[1:]]
+
+    # Sum each protein's dipeptide weights in residue order, like instability_index(), by
+    # stacking proteins of similar length as columns and reducing down the rows
+    scores = np.zeros(len(seqs), dtype=np.float64)
+    order = np.argsort(lengths, kind='stable')
+    for group_start in range(0, len(seqs), GROUP_SIZE):
+        group = order[group_start:group_start + GROUP_SIZE]
+        num_pairs = lengths[group] - 1
+        max_pairs = num_pairs.max()
+        if max_pairs == 0:
+            continue
+        offsets = np.arange(max_pairs)[:, None]
+        positions = np.minimum(starts[group][None, :] + offsets, len(weights) - 1)
+        scores[group] = np.where(offsets < num_pairs[None, :], weights[positions], 0.0).sum(axis=0)
+    return (10.0 / lengths) * scores
+
+def iter_chunks(fasta_file, progress):
+    """Yield lists of up to CHUNK_SIZE (id, sequence) pairs streamed from a FASTA file."""
+    chunk = []
+    for header, sequence in read_fasta(fasta_file, progress):
+        chunk.append((record_id(header), sequence.decode('latin-1')))
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 def calculate_instability_for_fasta(fasta_file, output_file):
-    # Parse the FASTA file and count the total number of sequences for tqdm
-    records = list(SeqIO.parse(fasta_file, "fasta"))
-    
     # Open the output file for writing
     with open(output_file, mode='w', newline='') as csvfile:
         csvwriter = csv.writer(csvfile)
         # Write header
         #csvwriter.writerow(["gene", "feature", "value"])
-        
-        # Use tqdm to add a progress bar
-        for record in tqdm(records, desc="Calculating Instability Index"):
-            seq = str(record.seq)
-            instability = instability_index(seq)
-            csvwriter.writerow([record.id, "instability", instability])
 
-# Specify the path to your FASTA file and the output CSV file
-fasta_file = sys.argv[1]
-output_file = sys.argv[2]
+        # Stream the FASTA one chunk of proteins at a time, with progress measured in bytes read
+        with fasta_progress(fasta_file, "Calculating Instability Index") as progress:
+            for chunk in iter_chunks(fasta_file, progress):
+                instabilities = instability_index_batch([sequence for _, sequence in chunk])
+                csvwriter.writerows([protein_id, "instability", instability] for (protein_id, _), instability in zip(chunk, instabilities.tolist()))
 
-# Run the function to calculate instability and save to CSV
-calculate_instability_for_fasta(fasta_file, output_file)
+if __name__ == "__main__":
+    # Specify the path to your FASTA file and the output CSV file
+    fasta_file = sys.argv[1]
+    output_file = sys.argv[2]
 
+    # Run the function to calculate instability and save to CSV
+    calculate_instability_for_fasta(fasta_file, output_file)
@@ -0,0 +1,134 @@
+import argparse
+import csv
+import os
+import numpy as np
+from fasta_io import read_fasta, record_id
+
+# Residue classes used by the composition properties
+GC_BASES = b'GCgc'
+POLAR_AAS = b'STYECQNHKR'
+HYDROPHOBIC_AAS = b'ACFGILMPVWY'
+
+# Number of sequence bytes encoded and scored together in one batch
+BATCH_BYTES = 8 * 1024 * 1024
+
+DEFAULT_COSTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AA_metabolic_costs.txt')
+
+def residue_mask(residues):
+    """Build a 256-entry lookup table that is True for the given residue bytes."""
+    table = np.zeros(256, dtype=bool)
+    table[np.frombuffer(residues, dtype=np.uint8)] = True
+    return table
+
+def load_metabolic_costs(costs_path):
+    """Build a 256-entry cost lookup table from AA_metabolic_costs.txt."""
+    table = np.zeros(256, dtype=np.float64)
+    with open(costs_path, 'r') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) >= 2:
+                table[ord(parts[0])] = float(parts[1])
+    return table
+
+def format_value(value):
+    # Match awk's number printing: integers as-is, everything else with "%.6g"
+    if value == int(value):
+        return str(int(value))
+    return '%.6g' % value
+
+def encode_batch(sequences):
+    """Encode a list of byte sequences as one uint8 array plus record boundaries."""
+    lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+    bounds = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=bounds[1:])
+    encoded = np.frombuffer(b''.join(sequences), dtype=np.uint8)
+    return encoded, lengths, bounds
+
+def segment_sums(values, bounds):
+    # Per-record sums from a running total, which also handles empty records
+    totals = np.zeros(len(values) + 1, dtype=np.float64 if values.dtype.kind == 'f' else np.int64)
+    np.cumsum(values, out=totals[1:])
+    return totals[bounds[1:]] - totals[bounds[:-1]]
+
+def iter_batches(fasta_path):
+    """Yield lists of (header, sequence) records totalling roughly BATCH_BYTES."""
+    batch = []
+    batch_bytes = 0
+    for record in read_fasta(fasta_path):
+        batch.append(record)
+        batch_bytes += len(record[1])
+        if batch_bytes >= BATCH_BYTES:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+def cds_properties(headers, sequences):
+    """Yield (id, feature, value) rows for length, GC and GC_3rd of a CDS batch."""
+    encoded, lengths, bounds = encode_batch(sequences)
+    is_gc = residue_mask(GC_BASES)[encoded]
+    gc_counts = segment_sums(is_gc, bounds)
+
+    # Position of every base within its own sequence, to pick out 3rd codon positions
+    positions = np.arange(len(encoded), dtype=np.int64) - np.repeat(bounds[:-1], lengths)
+    third_gc_counts = segment_sums(is_gc & (positions % 3 == 2), bounds)
+
+    for header, length, gc_count, third_gc_count in zip(headers, lengths.tolist(), gc_counts.tolist(), third_gc_counts.tolist()):
+        yield 'length', (header, 'length', length)
+        if length > 0:
+            yield 'gc', (header, 'GC', format_value(gc_count / length * 100))
+            yield 'gc_3rd', (header, 'GC_3rd', format_value(third_gc_count / (length / 3) * 100))
+
+def protein_properties(headers, sequences, costs):
+    """Yield (id, feature, value) rows for polarAA, hydrophobicAA and metabol of a protein batch."""
+    encoded, lengths, bounds = encode_batch(sequences)
+    polar_counts = segment_sums(residue_mask(POLAR_AAS)[encoded], bounds)
+    hydrophobic_counts = segment_sums(residue_mask(HYDROPHOBIC_AAS)[encoded], bounds)
+    total_costs = segment_sums(costs[encoded], bounds)
+
+    for header, length, polar_count, hydrophobic_count, total_cost in zip(headers, lengths.tolist(), polar_counts.tolist(), hydrophobic_counts.tolist(), total_costs.tolist()):
+        if length == 0:
+            continue
+        identifier = record_id(header)
+        yield 'polar_aa', (identifier, 'polarAA', format_value(polar_count / length * 100))
+        yield 'hydrophobic_aa', (identifier, 'hydrophobicAA', format_value(hydrophobic_count / length * 100))
+        yield 'metabol', (identifier, 'metabol', format_value(total_cost / length))
+
+def write_properties(fasta_path, calculate, suffixes, output_prefix):
+    # Stream the FASTA once and fan each property row out to its own CSV
+    handles = {suffix: open(f"{output_prefix}_{suffix}.csv", 'w', newline='') for suffix in suffixes}
+    try:
+        writers = {suffix: csv.writer(handle, lineterminator='\n') for suffix, handle in handles.items()}
+        count = 0
+        for batch in iter_batches(fasta_path):
+            headers = [header for header, _ in batch]
+            sequences = [sequence for _, sequence in batch]
+            for suffix, row in calculate(headers, sequences):
+                writers[suffix].writerow(row)
+            count += len(batch)
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return count
+
+def calculate_seqprops(cds_fasta, protein_fasta, output_prefix, costs_file=DEFAULT_COSTS_FILE):
+    """Write the length, GC, GC_3rd, polarAA, hydrophobicAA and metabol CSVs in one pass per FASTA."""
+    costs = load_metabolic_costs(costs_file)
+    num_cds = write_properties(cds_fasta, cds_properties, ['length', 'gc', 'gc_3rd'], output_prefix)
+    num_proteins = write_properties(protein_fasta, lambda headers, sequences: protein_properties(headers, sequences, costs),
+                                    ['polar_aa', 'hydrophobic_aa', 'metabol'], output_prefix)
+    return num_cds, num_proteins
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculate composition-based sequence properties in a single pass over each FASTA.")
+    parser.add_argument('cds_fasta', help="CDS (nucleotide) FASTA file")
+    parser.add_argument('protein_fasta', help="Protein FASTA file")
+    parser.add_argument('alias', help="Prefix for the output CSV files")
+    parser.add_argument('--output-dir', default='.', help="Directory to write the CSV files to")
+    parser.add_argument('--costs', default=DEFAULT_COSTS_FILE, help="Amino acid metabolic costs table")
+    args = parser.parse_args()
+
+    output_prefix = os.path.join(args.output_dir, args.alias)
+    num_cds, num_proteins = calculate_seqprops(args.cds_fasta, args.protein_fasta, output_prefix, args.costs)
+    print(f"Calculated properties for {num_cds} CDSs and {num_proteins} proteins.")
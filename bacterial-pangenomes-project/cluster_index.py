@@ -0,0 +1,121 @@
+"""Compact, persisted index of an MMseqs2 clusters.tsv file.
+
+The index is built in one pass over clusters.tsv and saved next to it as
+<clusters file>.index.npz (clusters.tsv.index.npz). It holds integer-coded
+NumPy arrays for the representative -> member counts and member ->
+representative lookups, plus the species' strain count, so later scripts
+can load it in milliseconds instead of re-parsing the TSV or listing the
+proteins directory. It is rebuilt when clusters.tsv changes, and the
+strain count is recounted only when the proteins directory changes.
+"""
+import os
+import re
+import numpy as np
+
+INDEX_SUFFIX = '.index.npz'
+
+
+def count_strains(proteins_dir, species_dir):
+    # Determine the number of strains by finding the highest strain number in the protein filenames
+    num_strains = 0
+    for filename in os.listdir(proteins_dir):
+        match = re.search(rf"{species_dir}_(\d+)_protein\.faa", filename)
+        if match:
+            strain_num = int(match.group(1))
+            num_strains = max(num_strains, strain_num)
+    return num_strains
+
+
+class ClusterIndex:
+    """Representatives, their member counts and a sorted member -> representative lookup."""
+
+    __slots__ = ('representatives', 'rep_counts', 'members', 'member_reps', 'num_strains')
+
+    def __init__(self, representatives, rep_counts, members, member_reps, num_strains):
+        self.representatives = representatives  # bytes IDs in order of first appearance
+        self.rep_counts = rep_counts            # members per representative
+        self.members = members                  # sorted bytes member IDs
+        self.member_reps = member_reps          # representative code of each sorted member
+        self.num_strains = num_strains
+
+    def representative_ids(self):
+        return [rep.decode() for rep in self.representatives.tolist()]
+
+    def representative_of(self, member_id):
+        """Return the representative of a member sequence, or None if it is not in any cluster."""
+        key = member_id.encode()
+        position = np.searchsorted(self.members, key)
+        if position < len(self.members) and self.members[position] == key:
+            return self.representatives[self.member_reps[position]].decode()
+        return None
+
+    def conservation(self):
+        """Yield (representative, fraction of strains) in order of first appearance."""
+        for rep, count in zip(self.representative_ids(), self.rep_counts.tolist()):
+            yield rep, count / self.num_strains
+
+
+def build_cluster_index(clusters_file, num_strains):
+    """Build a ClusterIndex with a single pass over clusters.tsv."""
+    rep_codes = {}
+    members = []
+    member_reps = []
+    with open(clusters_file, 'rb') as file:
+        for line in file:
+            rep_seq, member = line.split()
+            code = rep_codes.setdefault(rep_seq, len(rep_codes))
+            members.append(member)
+            member_reps.append(code)
+
+    member_reps = np.array(member_reps, dtype=np.int32)
+    rep_counts = np.bincount(member_reps, minlength=len(rep_codes)).astype(np.int64)
+    members = np.array(members, dtype=bytes)
+    order = np.argsort(members, kind='stable')
+    return ClusterIndex(np.array(list(rep_codes), dtype=bytes), rep_counts, members[order], member_reps[order], num_strains)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def save_cluster_index(index, index_path, clusters_file, proteins_dir):
+    # Write under a temporary name first so concurrent readers never see a partial file
+    temp_path = index_path + '.tmp.npz'
+    np.savez(temp_path, representatives=index.representatives, rep_counts=index.rep_counts,
+             members=index.members, member_reps=index.member_reps, num_strains=index.num_strains,
+             source=np.array(file_signature(clusters_file), dtype=np.int64),
+             proteins_mtime=np.int64(os.stat(proteins_dir).st_mtime_ns))
+    os.replace(temp_path, index_path)
+
+
+def load_cluster_index(clusters_file, proteins_dir, species_dir):
+    """Load the persisted index for clusters.tsv, rebuilding it if it is missing or stale.
+
+    The stored strain count is reused while the proteins directory's mtime is
+    unchanged (adding or removing a protein file changes it).
+    """
+    index_path = clusters_file + INDEX_SUFFIX
+    if os.path.isfile(index_path):
+        with np.load(index_path, allow_pickle=False) as data:
+            if data['source'].tolist() == file_signature(clusters_file):
+                index = ClusterIndex(data['representatives'], data['rep_counts'], data['members'],
+                                     data['member_reps'], int(data['num_strains']))
+                if 'proteins_mtime' in data.files and int(data['proteins_mtime']) == os.stat(proteins_dir).st_mtime_ns:
+                    return index
+                index.num_strains = count_strains(proteins_dir, species_dir)
+                save_cluster_index(index, index_path, clusters_file, proteins_dir)
+                return index
+    index = build_cluster_index(clusters_file, count_strains(proteins_dir, species_dir))
+    save_cluster_index(index, index_path, clusters_file, proteins_dir)
+    return index
+
+
+def species_cluster_index(species_path):
+    """Load (or build) the cluster index for a species directory, or None if it has no clusters.tsv."""
+    species_dir = os.path.basename(os.path.normpath(species_path))
+    proteins_dir = os.path.join(species_path, f"{species_dir}_proteins")
+    clusters_file = os.path.join(proteins_dir, "clustering", "clusters.tsv")
+    if not os.path.isfile(clusters_file):
+        return None
+    return load_cluster_index(clusters_file, proteins_dir, species_dir)
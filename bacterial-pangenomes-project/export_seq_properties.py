@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+FORMATS = ['parquet', 'feather']
+
+# Every property the pipeline writes, in column order; all are stored as float64 so that
+# every species' table has the same schema, and a property a species lacks is a NaN column
+FEATURES = ['length', 'GC', 'GC_3rd', 'polarAA', 'hydrophobicAA', 'metabol', 'cai', 'instability', 'disorder',
+            'transmembrane', 'signal_peptide', 'tm_coverage', 'aa_comp_bias', 'conservation_percentage']
+
+SCHEMA = pa.schema([('species', pa.dictionary(pa.int32(), pa.string())), ('gene', pa.dictionary(pa.int32(), pa.string()))] +
+                   [(feature, pa.float64()) for feature in FEATURES])
+
+def long_to_wide(properties_csv, species):
+    """Pivot a headerless id,feature,value CSV into one row per gene and one float64 column per feature in FEATURES."""
+    long_df = pd.read_csv(properties_csv, header=None, names=['gene', 'feature', 'value'], dtype=str)
+    long_df['value'] = pd.to_numeric(long_df['value'], errors='coerce')
+    long_df = long_df.drop_duplicates(subset=['gene', 'feature'], keep='last')
+
+    unknown = sorted(set(long_df['feature']) - set(FEATURES))
+    if unknown:
+        print(f"{properties_csv}: ignoring unknown features {', '.join(unknown)}", file=sys.stderr)
+    wide_df = long_df.pivot(index='gene', columns='feature', values='value')
+    wide_df = wide_df.reindex(columns=FEATURES).astype('float64')
+    wide_df.columns.name = None
+
+    wide_df = wide_df.reset_index()
+    # Gene and species IDs are dictionary-encoded in the columnar file
+    wide_df['gene'] = wide_df['gene'].astype('category')
+    wide_df.insert(0, 'species', pd.Categorical([species] * len(wide_df)))
+    return wide_df
+
+def write_columnar(wide_df, output_path, file_format='parquet'):
+    table = pa.Table.from_pandas(wide_df, schema=SCHEMA, preserve_index=False)
+    if file_format == 'parquet':
+        pq.write_table(table, output_path, compression='zstd')
+    else:
+        feather.write_feather(table, output_path, compression='zstd')
+
+def read_seq_properties(path, columns=None):
+    """Load a columnar seq_properties table, reading only the requested columns."""
+    if path.endswith('.feather'):
+        return pd.read_feather(path, columns=columns)
+    return pd.read_parquet(path, columns=columns)
+
+def default_species(properties_csv):
+    name = os.path.basename(properties_csv)
+    return name[:-len('_seq_properties.csv')] if name.endswith('_seq_properties.csv') else os.path.splitext(name)[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a long-format seq_properties CSV as a wide, typed Parquet/Feather table.")
+    parser.add_argument('properties_csv', help="Headerless id,feature,value CSV (e.g. <alias>_seq_properties.csv)")
+    parser.add_argument('--output', help="Output file (default: the CSV path with a .parquet/.feather extension)")
+    parser.add_argument('--species', help="Species name stored in the species column (default: taken from the file name)")
+    parser.add_argument('--format', choices=FORMATS, default='parquet', help="Columnar format to write")
+    args = parser.parse_args()
+
+    species = args.species or default_species(args.properties_csv)
+    output_path = args.output or f"{os.path.splitext(args.properties_csv)[0]}.{args.format}"
+    wide_df = long_to_wide(args.properties_csv, species)
+    write_columnar(wide_df, output_path, args.format)
+    print(f"Wrote {len(wide_df)} genes x {len(wide_df.columns) - 2} properties to {output_path}")
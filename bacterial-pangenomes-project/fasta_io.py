@@ -0,0 +1,237 @@
+"""Lightweight streaming FASTA helpers shared by the pangenome scripts."""
+import argparse
+import mmap
+import os
+from tqdm import tqdm
+
+# Bytes of formatted records collected before FastaWriter hits the disk
+WRITE_BUFFER_BYTES = 4 * 1024 * 1024
+# samtools-compatible index stored beside the FASTA: name, length, offset, linebases, linewidth
+FAI_SUFFIX = '.fai'
+
+
+def read_fasta(fasta_path, progress=None):
+    """Yield (header, sequence) pairs from a FASTA file, one record at a time.
+
+    The header is the full header line without the leading '>' and the
+    sequence is the concatenation of its (possibly wrapped) lines as bytes.
+    If a progress bar is given it is advanced by the bytes read.
+    """
+    with open(fasta_path, 'rb') as handle:
+        header = None
+        chunks = []
+        bytes_read = 0
+        for line in handle:
+            if line.startswith(b'>'):
+                if header is not None:
+                    if progress is not None:
+                        progress.update(bytes_read)
+                        bytes_read = 0
+                    yield header, b''.join(chunks)
+                header = line[1:].rstrip(b'\r\n').decode()
+                chunks = []
+            elif header is not None:
+                chunks.append(line.rstrip(b'\r\n'))
+            bytes_read += len(line)
+        if progress is not None:
+            progress.update(bytes_read)
+        if header is not None:
+            yield header, b''.join(chunks)
+
+
+def record_id(header):
+    """Return the record ID (first word) of a FASTA header, like Biopython's record.id."""
+    return (header.split(None, 1) or [''])[0]
+
+
+def fasta_progress(fasta_path, desc):
+    """Create a tqdm progress bar sized by the FASTA file's bytes rather than its record count."""
+    return tqdm(total=os.path.getsize(fasta_path), desc=desc, unit='B', unit_scale=True)
+
+
+class FastaWriter:
+    """Buffered FASTA writer that formats records in memory and writes them in bulk.
+
+    Sequences are wrapped at line_width residues (60, like Bio.SeqIO) or
+    written on a single line when line_width is 0.
+    """
+
+    __slots__ = ('handle', 'line_width', 'buffer', 'buffered_bytes')
+
+    def __init__(self, output_path, line_width=60):
+        self.handle = open(output_path, 'wb')
+        self.line_width = line_width
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def write(self, header, sequence):
+        record = [b'>', header.encode(), b'\n']
+        if self.line_width:
+            for start in range(0, len(sequence), self.line_width):
+                record.append(sequence[start:start + self.line_width])
+                record.append(b'\n')
+        elif sequence:
+            record.append(sequence)
+            record.append(b'\n')
+        self.buffer.extend(record)
+        self.buffered_bytes += len(header) + len(sequence) + 2
+        if self.buffered_bytes >= WRITE_BUFFER_BYTES:
+            self.flush()
+
+    def flush(self):
+        self.handle.write(b''.join(self.buffer))
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def close(self):
+        self.flush()
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def build_fasta_index(fasta_path):
+    """Write <fasta>.fai in one pass and return its path.
+
+    Like samtools faidx, every line of a record except the last must hold
+    the same number of residues, so any residue's byte offset can be computed.
+    Records are named by their first header word.
+    """
+    entries = []
+    offset = 0
+    name = None
+
+    def check(bases, line):
+        nonlocal linebases, linewidth, short_line
+        if not bases:
+            short_line = True
+            return
+        if short_line or (linebases and bases > linebases):
+            raise ValueError(f"{fasta_path}: record {name} has lines of different lengths and cannot be indexed")
+        if not linebases:
+            linebases = bases
+            linewidth = len(line) if len(line) > bases else bases + 1
+        elif bases < linebases:
+            short_line = True
+
+    with open(fasta_path, 'rb') as handle:
+        for line in handle:
+            if line.startswith(b'>'):
+                if name is not None:
+                    entries.append((name, length, sequence_offset, linebases, linewidth))
+                name = record_id(line[1:].rstrip(b'\r\n').decode())
+                sequence_offset = offset + len(line)
+                length = linebases = linewidth = 0
+                short_line = False
+            elif name is not None:
+                bases = len(line.rstrip(b'\r\n'))
+                check(bases, line)
+                length += bases
+            offset += len(line)
+        if name is not None:
+            entries.append((name, length, sequence_offset, linebases, linewidth))
+
+    # Write under a temporary name first so concurrent readers never see a partial index
+    index_path = fasta_path + FAI_SUFFIX
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'w') as index_file:
+        index_file.write(''.join(f"{name}\t{length}\t{sequence_offset}\t{linebases}\t{linewidth}\n"
+                                 for name, length, sequence_offset, linebases, linewidth in entries))
+    os.replace(temp_path, index_path)
+    return index_path
+
+
+def fasta_index_is_fresh(fasta_path):
+    index_path = fasta_path + FAI_SUFFIX
+    return os.path.isfile(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(fasta_path)
+
+
+class FastaIndex:
+    """Random access to the records of an indexed FASTA through a memory map.
+
+    Only the .fai is read up front; sequences are sliced out of the map on
+    demand. If a name occurs more than once the first record is used.
+    """
+
+    __slots__ = ('entries', 'handle', 'data')
+
+    def __init__(self, fasta_path):
+        self.entries = {}
+        with open(fasta_path + FAI_SUFFIX, 'r') as index_file:
+            for line in index_file:
+                name, length, offset, linebases, linewidth = line.rstrip('\n').split('\t')[:5]
+                self.entries.setdefault(name, (int(length), int(offset), int(linebases), int(linewidth)))
+        self.handle = open(fasta_path, 'rb')
+        size = os.fstat(self.handle.fileno()).st_size
+        self.data = mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        # Names in file order
+        return iter(self.entries)
+
+    def length(self, name):
+        return self.entries[name][0]
+
+    def lengths(self):
+        """Return {name: sequence length} in file order without touching the sequences."""
+        return {name: entry[0] for name, entry in self.entries.items()}
+
+    def offset(self, name):
+        return self.entries[name][1]
+
+    def raw(self, name):
+        """Zero-copy view of a record's sequence lines as stored, newlines included.
+
+        Release the view (or let it go out of scope) before closing the index.
+        """
+        length, offset, linebases, linewidth = self.entries[name]
+        if not length:
+            return memoryview(b'')
+        full_lines, remainder = divmod(length, linebases)
+        end = offset + full_lines * linewidth + (remainder + linewidth - linebases if remainder else 0)
+        return memoryview(self.data)[offset:min(end, len(self.data))]
+
+    def fetch(self, name):
+        """Return a record's sequence as bytes, with the line breaks removed."""
+        length, offset, linebases, _ = self.entries[name]
+        if length <= linebases:
+            return self.data[offset:offset + length]
+        with self.raw(name) as view:
+            return view.tobytes().replace(b'\n', b'').replace(b'\r', b'')
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_fasta_index(fasta_path):
+    """Open the index of a FASTA, (re)building <fasta>.fai first if it is missing or older than the FASTA."""
+    if not fasta_index_is_fresh(fasta_path):
+        build_fasta_index(fasta_path)
+    return FastaIndex(fasta_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build samtools-style .fai indexes beside FASTA files.")
+    parser.add_argument('fasta_files', nargs='+', help="FASTA files to index")
+    args = parser.parse_args()
+
+    for fasta_path in args.fasta_files:
+        print(f"Indexed {fasta_path} -> {build_fasta_index(fasta_path)}")
@@ -1,56 +1,135 @@
+import mmap
 import os
 import re
-from Bio import SeqIO
+from concurrent.futures import ThreadPoolExecutor
+from cluster_index import species_cluster_index
+from fasta_io import WRITE_BUFFER_BYTES, build_fasta_index, fasta_index_is_fresh, FastaIndex
 
 # Define the base directory containing all bacterial species folders
 base_dir = "/stor/scratch/Ochman/kristen/pangenome/all_bacterial_species"
 
-# Loop through each bacterial species directory
-for species_dir in os.listdir(base_dir):
-    species_path = os.path.join(base_dir, species_dir)
-    
+# RefSeq protein ID (e.g. WP_011407161.1), matched against raw header bytes
+PROTEIN_ID = re.compile(rb"WP_\d+\.\d+")
+
+def extract_rep_sequences(input_file, output_file, rep_seqs):
+    """Write each representative record of a FASTA once, renamed to its protein ID.
+
+    Works on a memory map of the input. Only headers are inspected; the
+    sequence lines of selected records are copied through as raw bytes
+    (keeping the input's line wrapping) and non-representative records
+    are skipped without being read into Python.
+    Returns the number of records written.
+    """
+    rep_keys = {rep_seq.encode() for rep_seq in rep_seqs}
+    written = set()  # Track written protein IDs to avoid duplicates
+
+    with open(input_file, 'rb') as handle, open(output_file, 'wb', buffering=WRITE_BUFFER_BYTES) as output_handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data, memoryview(data) as view:
+            size = len(data)
+            position = 0 if data[:1] == b'>' else data.find(b'\n>') + 1
+            if data[position:position + 1] != b'>':
+                return 0
+            while True:
+                header_end = data.find(b'\n', position)
+                if header_end == -1:
+                    header_end = size
+                next_record = data.find(b'\n>', header_end)
+                body_end = size if next_record == -1 else next_record + 1
+
+                # Extract the protein ID from the record ID (the first word of the header)
+                header_words = data[position + 1:header_end].split(None, 1)
+                protein_id_match = PROTEIN_ID.search(header_words[0]) if header_words else None
+                if protein_id_match:
+                    protein_id = protein_id_match.group()
+                    if protein_id in rep_keys and protein_id not in written:
+                        written.add(protein_id)
+                        # Renamed header followed by the untouched sequence lines
+                        output_handle.write(b'>' + protein_id + b'\n')
+                        output_handle.write(view[header_end + 1:body_end])
+                        if body_end == size and size > header_end + 1 and data[size - 1:size] != b'\n':
+                            output_handle.write(b'\n')
+
+                if next_record == -1:
+                    break
+                position = next_record + 1
+    return len(written)
+
+def extract_rep_sequences_indexed(input_file, output_file, rep_seqs):
+    """extract_rep_sequences() for a FASTA with an up-to-date .fai index.
+
+    Representatives are found from the record names in the index alone, and
+    only the selected records' sequence lines are read from the memory map.
+    Returns the number of records written.
+    """
+    rep_keys = set(rep_seqs)
+    selected = {}  # protein ID -> first record name carrying it
+    with FastaIndex(input_file) as index, open(output_file, 'wb', buffering=WRITE_BUFFER_BYTES) as output_handle:
+        for name in index:
+            protein_id_match = PROTEIN_ID.search(name.encode())
+            if protein_id_match:
+                protein_id = protein_id_match.group().decode()
+                if protein_id in rep_keys and protein_id not in selected:
+                    selected[protein_id] = name
+
+        # Write in file order, as the sequential scan does
+        for protein_id, name in sorted(selected.items(), key=lambda item: index.offset(item[1])):
+            output_handle.write(b'>' + protein_id.encode() + b'\n')
+            sequence = index.raw(name)
+            output_handle.write(sequence)
+            if len(sequence) and sequence[-1:] != b'\n':
+                output_handle.write(b'\n')
+            sequence.release()
+    return len(selected)
+
+def extract_rep_sequences_with_index(input_file, output_file, rep_seqs):
+    """Build or refresh the input's .fai index, then extract through it.
+
+    The index is kept beside the FASTA, so a re-run (e.g. after re-clustering)
+    only reads the selected records. A FASTA with irregular line wrapping
+    cannot be indexed and is scanned instead.
+    """
+    if not fasta_index_is_fresh(input_file):
+        try:
+            build_fasta_index(input_file)
+        except ValueError:
+            return extract_rep_sequences(input_file, output_file, rep_seqs)
+    return extract_rep_sequences_indexed(input_file, output_file, rep_seqs)
+
+def filter_species(species_path):
+    """Write rep_<species>_cds.fna and rep_<species>_proteins.faa for one species directory.
+
+    Returns False if the species is missing its concatenated FASTAs or clusters.tsv.
+    """
+    species_dir = os.path.basename(os.path.normpath(species_path))
+
     # Paths to input and output files
-    clustering_dir = os.path.join(species_path, f"{species_dir}_proteins/clustering")
     cds_file = os.path.join(species_path, f"{species_dir}_CDSs", f"all_{species_dir}_cds.fna")
     protein_file = os.path.join(species_path, f"{species_dir}_proteins", f"all_{species_dir}_proteins.faa")
     output_cds_file = os.path.join(species_path, f"rep_{species_dir}_cds.fna")
     output_protein_file = os.path.join(species_path, f"rep_{species_dir}_proteins.faa")
-    
+
     # Check if the necessary input files exist
     if not (os.path.isfile(cds_file) and os.path.isfile(protein_file)):
-        continue
-    
-    # Read representative sequence IDs from clusters.tsv
-    clusters_file = os.path.join(clustering_dir, "clusters.tsv")
-    if not os.path.isfile(clusters_file):
-        continue
-    
-    rep_seqs = set()
-    with open(clusters_file, 'r') as f:
-        for line in f:
-            rep_seq = line.strip().split()[0]  # First column is the representative sequence
-            rep_seqs.add(rep_seq)
-    
-    # Define a function to filter, deduplicate, and rename sequences
-    def filter_deduplicate_sequences(input_file, output_file, rep_seqs):
-        unique_sequences = set()  # Track unique sequence IDs to avoid duplicates
-        
-        with open(output_file, 'w') as output_handle:
-            for record in SeqIO.parse(input_file, "fasta"):
-                # Extract the protein ID from the record ID (e.g., WP_011407161.1)
-                protein_id_match = re.search(r"WP_\d+\.\d+", record.id)
-                if protein_id_match:
-                    protein_id = protein_id_match.group()
-                    # Check if the protein ID is a representative sequence and not already written
-                    if protein_id in rep_seqs and protein_id not in unique_sequences:
-                        # Add to unique sequences set to prevent duplicates
-                        unique_sequences.add(protein_id)
-                        # Rename the sequence ID and write it to the output file
-                        record.id = protein_id
-                        record.description = ""  # Clear the description
-                        SeqIO.write(record, output_handle, "fasta")
-    
-    # Filter, deduplicate, and rename sequences for CDS and protein files
-    filter_deduplicate_sequences(cds_file, output_cds_file, rep_seqs)
-    filter_deduplicate_sequences(protein_file, output_protein_file, rep_seqs)
+        return False
+
+    # Read representative sequence IDs from the persisted clusters.tsv index
+    index = species_cluster_index(species_path)
+    if index is None:
+        return False
+    rep_seqs = set(index.representative_ids())
+
+    # Filter, deduplicate, and rename sequences for the CDS and protein files concurrently,
+    # through each FASTA's .fai index
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        jobs = [executor.submit(extract_rep_sequences_with_index, input_file, output_file, rep_seqs)
+                for input_file, output_file in [(cds_file, output_cds_file), (protein_file, output_protein_file)]]
+        for job in jobs:
+            job.result()
+    return True
 
+if __name__ == "__main__":
+    # Loop through each bacterial species directory
+    for species_dir in os.listdir(base_dir):
+        filter_species(os.path.join(base_dir, species_dir))
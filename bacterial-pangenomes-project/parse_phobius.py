@@ -0,0 +1,89 @@
+import argparse
+import csv
+import re
+from fasta_io import load_fasta_index
+
+# A transmembrane segment is a start-end range entered from the inside (i) or outside (o)
+# and followed by the opposite side, e.g. the 31-52 and 59-80 in "n5-16c21/22o31-52i59-80o".
+# Signal peptide ranges (n/h/c regions and the "/" cleavage site) never match.
+TM_SEGMENT = re.compile(r'[io](\d+)-(\d+)(?=[io])')
+
+def iter_phobius(phobius_file):
+    """Yield (sequence_id, tm_count, sp_value, prediction) for each line of a Phobius -short file."""
+    with open(phobius_file, 'r') as file:
+        next(file, None)  # Skip the header line
+        for line in file:
+            parts = line.split()
+            if not parts:
+                continue
+            yield parts[0], parts[1], parts[2], parts[3] if len(parts) > 3 else ''
+
+def tm_total_length(prediction):
+    """Total number of residues in the transmembrane segments of a Phobius topology string."""
+    return sum(int(end) - int(start) + 1 for start, end in TM_SEGMENT.findall(prediction))
+
+def load_lengths(lengths_file):
+    """Index sequence lengths by ID from a <alias>_length.csv file (id,length,value) or a CDS FASTA.
+
+    A FASTA's lengths come from its .fai index (built on first use), so the sequences are never read.
+    """
+    with open(lengths_file, 'rb') as file:
+        is_fasta = file.read(1) == b'>'
+    if is_fasta:
+        with load_fasta_index(lengths_file) as index:
+            return index.lengths()
+
+    lengths = {}
+    with open(lengths_file, 'r') as file:
+        for line in file:
+            sequence_id, _, value = line.rstrip('\r\n').rpartition(',')
+            sequence_id = sequence_id.rpartition(',')[0]
+            if sequence_id:
+                lengths[sequence_id] = int(value)
+    return lengths
+
+def tm_coverage(tm_count, prediction, sequence_length):
+    # Fraction of the protein (CDS length in codons) covered by transmembrane segments
+    if int(tm_count) == 0:
+        return 0.0
+    return tm_total_length(prediction) / (sequence_length // 3)
+
+def parse_phobius(phobius_file, tm_output=None, sp_output=None, coverage_output=None, lengths_file=None):
+    """Read a Phobius -short file once and write any of the tm, signal peptide and tm_coverage CSVs."""
+    lengths = load_lengths(lengths_file) if coverage_output else {}
+    outputs = [open(path, 'w', newline='') if path else None for path in (tm_output, sp_output, coverage_output)]
+    tm_writer, sp_writer, coverage_writer = [csv.writer(handle) if handle else None for handle in outputs]
+    covered = set()
+    try:
+        for seq_id, tm_value, sp_value, prediction in iter_phobius(phobius_file):
+            if tm_writer:
+                tm_writer.writerow([seq_id, 'transmembrane', tm_value])
+            if sp_writer:
+                sp_writer.writerow([seq_id, 'signal_peptide', 1 if sp_value == "Y" else sp_value])
+            if coverage_writer and seq_id in lengths and seq_id not in covered:
+                covered.add(seq_id)
+                coverage_writer.writerow([seq_id, 'tm_coverage', tm_coverage(tm_value, prediction, lengths[seq_id])])
+
+        # Sequences without a Phobius prediction have no transmembrane coverage
+        if coverage_writer:
+            for seq_id in lengths:
+                if seq_id not in covered:
+                    coverage_writer.writerow([seq_id, 'tm_coverage', 0.0])
+    finally:
+        for handle in outputs:
+            if handle:
+                handle.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a Phobius -short file into tm, signal peptide and tm_coverage CSVs in one pass.")
+    parser.add_argument('phobius_file', help="Phobius -short output")
+    parser.add_argument('--tm', help="Output CSV for the number of transmembrane domains")
+    parser.add_argument('--sp', help="Output CSV for signal peptide presence/absence")
+    parser.add_argument('--tm-coverage', help="Output CSV for transmembrane coverage (needs --lengths)")
+    parser.add_argument('--lengths', help="<alias>_length.csv or the CDS FASTA with the CDS lengths")
+    args = parser.parse_args()
+    if args.tm_coverage and not args.lengths:
+        parser.error("--tm-coverage needs --lengths")
+
+    parse_phobius(args.phobius_file, args.tm, args.sp, args.tm_coverage, args.lengths)
+    print(f"Phobius results written to {', '.join(path for path in (args.tm, args.sp, args.tm_coverage) if path)}")
@@ -0,0 +1,343 @@
+import argparse
+import csv
+import functools
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import calculate_cai
+import calculate_disorder
+import calculate_instability
+import calculate_seqprops
+import cluster_index
+import conservation_percentage_calculations
+import export_seq_properties
+import filter_fastas_to_rep_seqs
+import parse_phobius
+import run_predictors
+import stage_metrics
+from fasta_io import read_fasta, FastaWriter
+from seqprop_cache import Manifest, module_version, run_cached, sha256_file
+
+# Define the base directory containing all bacterial species folders
+base_dir = "/stor/scratch/Ochman/kristen/pangenome/all_bacterial_species"
+
+AA_COMP_BIAS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calc_aa_comp_bias.R')
+
+def species_paths(species_path):
+    """Return the rep, linearized and output paths used by the per-species stages."""
+    species = os.path.basename(os.path.normpath(species_path))
+    proteins_dir = os.path.join(species_path, f"{species}_proteins")
+    return {
+        'all_cds_fasta': os.path.join(species_path, f"{species}_CDSs", f"all_{species}_cds.fna"),
+        'all_protein_fasta': os.path.join(proteins_dir, f"all_{species}_proteins.faa"),
+        'proteins_dir': proteins_dir,
+        'clusters_file': os.path.join(proteins_dir, "clustering", "clusters.tsv"),
+        'cds_fasta': os.path.join(species_path, f"rep_{species}_cds.fna"),
+        'protein_fasta': os.path.join(species_path, f"rep_{species}_proteins.faa"),
+        'linear_cds_fasta': os.path.join(species_path, f"linear_rep_{species}_cds.fna"),
+        'linear_protein_fasta': os.path.join(species_path, f"linear_rep_{species}_proteins.faa"),
+        'output_dir': os.path.join(species_path, "rep_seq_properties"),
+        'alias': species,
+    }
+
+@functools.lru_cache(maxsize=None)
+def script_version(module):
+    # Hash of a stage's source file and the local modules it imports (fasta_io, calculate_seqprops, ...),
+    # so editing the script or a shared helper invalidates its cached outputs
+    return module_version(module)
+
+def all_exist(paths):
+    return all(os.path.isfile(path) for path in paths)
+
+def filter_stage(species_path, manifest, force):
+    paths = species_paths(species_path)
+    inputs = [paths['all_cds_fasta'], paths['all_protein_fasta'], paths['clusters_file']]
+    if not all_exist(inputs):
+        return 'skipped'
+    return run_cached(manifest, [paths['cds_fasta'], paths['protein_fasta']], inputs,
+                      'filter_fastas_to_rep_seqs', script_version(filter_fastas_to_rep_seqs), {},
+                      lambda: filter_fastas_to_rep_seqs.filter_species(species_path), force)
+
+def linearize(fasta, linear_fasta):
+    # Rewrite a FASTA with each sequence on a single line
+    with FastaWriter(linear_fasta, line_width=0) as writer:
+        for header, sequence in read_fasta(fasta):
+            writer.write(header, sequence)
+
+def linearize_stage(species_path, manifest, force):
+    paths = species_paths(species_path)
+    statuses = []
+    for fasta, linear_fasta in [(paths['cds_fasta'], paths['linear_cds_fasta']), (paths['protein_fasta'], paths['linear_protein_fasta'])]:
+        if not os.path.isfile(fasta):
+            return 'skipped'
+        statuses.append(run_cached(manifest, [linear_fasta], [fasta], 'linearize', '1', {},
+                                   functools.partial(linearize, fasta, linear_fasta), force))
+    return 'ok' if 'ok' in statuses else 'cached'
+
+def properties_stage(species_path, manifest, force):
+    # Composition properties, instability and CAI, written to rep_seq_properties
+    paths = species_paths(species_path)
+    cds_fasta, protein_fasta = paths['linear_cds_fasta'], paths['linear_protein_fasta']
+    if not all_exist([cds_fasta, protein_fasta]):
+        return 'skipped'
+    output_prefix = os.path.join(paths['output_dir'], paths['alias'])
+
+    seqprop_outputs = [f"{output_prefix}_{suffix}.csv" for suffix in ['length', 'gc', 'gc_3rd', 'polar_aa', 'hydrophobic_aa', 'metabol']]
+    statuses = [
+        run_cached(manifest, seqprop_outputs, [cds_fasta, protein_fasta, calculate_seqprops.DEFAULT_COSTS_FILE],
+                   'calculate_seqprops', script_version(calculate_seqprops), {},
+                   lambda: calculate_seqprops.calculate_seqprops(cds_fasta, protein_fasta, output_prefix), force),
+        run_cached(manifest, [f"{output_prefix}_instability.csv"], [protein_fasta],
+                   'calculate_instability', script_version(calculate_instability), {},
+                   lambda: calculate_instability.calculate_instability_for_fasta(protein_fasta, f"{output_prefix}_instability.csv"), force),
+    ]
+    status = 'ok' if 'ok' in statuses else 'cached'
+    # CAI needs the reference codon usage table, which only exists where EMBOSS is installed;
+    # without it the stage reports that the cai property is missing instead of looking complete
+    if not os.path.isfile(calculate_cai.CAI_CODON_TABLE):
+        print(f"{paths['alias']}: codon usage table {calculate_cai.CAI_CODON_TABLE} not found, skipping CAI", file=sys.stderr)
+        return f"{status} (no CAI)"
+    cai_status = run_cached(manifest, [f"{output_prefix}_cai.csv"], [cds_fasta, calculate_cai.CAI_CODON_TABLE],
+                            'calculate_cai', script_version(calculate_cai), {},
+                            lambda: calculate_cai.calculate_cai(cds_fasta, f"{output_prefix}_cai.csv", calculate_cai.CAI_CODON_TABLE), force)
+    return 'ok' if 'ok' in (status, cai_status) else 'cached'
+
+def output_file(paths, suffix):
+    return os.path.join(paths['output_dir'], f"{paths['alias']}_{suffix}")
+
+def predictors_stage(species_path, manifest, force, predictor_shards=1):
+    # IUPred3 and Phobius; run_predictors records its per-tool entries in this species' manifest
+    paths = species_paths(species_path)
+    protein_fasta = paths['linear_protein_fasta']
+    tools = [tool for tool, path in [('iupred3', run_predictors.IUPRED3), ('phobius', run_predictors.PHOBIUS)] if os.path.isfile(path)]
+    if not os.path.isfile(protein_fasta) or not tools:
+        return 'skipped'
+    if force:
+        for output in run_predictors.output_paths(paths['output_dir'], paths['alias']).values():
+            if os.path.isfile(output):
+                os.remove(output)
+    # One process per Phobius shard plus the unsharded IUPred3 run, so the tools run side by side
+    workers = max(predictor_shards, 1) + len(tools) - 1
+    ran = run_predictors.run_predictors(protein_fasta, paths['output_dir'], paths['alias'], tools,
+                                        num_shards=predictor_shards, workers=workers, use_cache=True, manifest=manifest)
+    return 'ok' if ran else 'cached'
+
+def disorder_stage(species_path, manifest, force):
+    paths = species_paths(species_path)
+    protein_fasta, iupred_output = paths['linear_protein_fasta'], output_file(paths, "iupred3_output.txt")
+    if not all_exist([protein_fasta, iupred_output]):
+        return 'skipped'
+    output = output_file(paths, "disorder.csv")
+    return run_cached(manifest, [output], [protein_fasta, iupred_output],
+                      'calculate_disorder', script_version(calculate_disorder), {},
+                      lambda: calculate_disorder.calculate_disorder(protein_fasta, iupred_output, output), force)
+
+def phobius_stage(species_path, manifest, force):
+    # Transmembrane domains, signal peptides and transmembrane coverage from one pass over the Phobius output
+    paths = species_paths(species_path)
+    phobius_output, lengths_csv = output_file(paths, "tm.phobius"), output_file(paths, "length.csv")
+    if not all_exist([phobius_output, lengths_csv]):
+        return 'skipped'
+    outputs = [output_file(paths, suffix) for suffix in ['tm.csv', 'sp.csv', 'tm_coverage.csv']]
+    return run_cached(manifest, outputs, [phobius_output, lengths_csv],
+                      'parse_phobius', script_version(parse_phobius), {},
+                      lambda: parse_phobius.parse_phobius(phobius_output, *outputs, lengths_csv), force)
+
+def aa_comp_bias_stage(species_path, manifest, force):
+    paths = species_paths(species_path)
+    protein_fasta = paths['linear_protein_fasta']
+    if not os.path.isfile(protein_fasta) or shutil.which('Rscript') is None:
+        return 'skipped'
+    output = output_file(paths, "aa_comp_bias.csv")
+    return run_cached(manifest, [output], [protein_fasta],
+                      'calc_aa_comp_bias', sha256_file(AA_COMP_BIAS_SCRIPT), {},
+                      lambda: subprocess.run(['Rscript', AA_COMP_BIAS_SCRIPT, protein_fasta, output], check=True), force)
+
+def conservation_stage(species_path, manifest, force):
+    paths = species_paths(species_path)
+    if not os.path.isfile(paths['clusters_file']):
+        return 'skipped'
+    # The strain count comes from the protein file names, so it is part of the cache key;
+    # the persisted cluster index only rescans the proteins directory when it has changed
+    num_strains = cluster_index.species_cluster_index(species_path).num_strains
+    output = os.path.join(paths['output_dir'], f"{paths['alias']}_conservation.csv")
+    return run_cached(manifest, [output], [paths['clusters_file']],
+                      'conservation_percentage_calculations', script_version(conservation_percentage_calculations),
+                      {'num_strains': num_strains},
+                      lambda: conservation_percentage_calculations.calculate_conservation(species_path), force)
+
+def property_csvs(paths):
+    # Every <alias>_*.csv in rep_seq_properties except the concatenated table itself, like the shell scripts' cat
+    concatenated = output_file(paths, "seq_properties.csv")
+    return [path for path in sorted(glob.glob(output_file(paths, "*.csv"))) if path != concatenated]
+
+def concatenate(csv_paths, output):
+    temp_path = output + '.tmp'
+    with open(temp_path, 'wb') as merged:
+        for csv_path in csv_paths:
+            with open(csv_path, 'rb') as file:
+                shutil.copyfileobj(file, merged)
+    os.replace(temp_path, output)
+
+def concatenate_stage(species_path, manifest, force):
+    paths = species_paths(species_path)
+    csv_paths = property_csvs(paths)
+    if not csv_paths:
+        return 'skipped'
+    output = output_file(paths, "seq_properties.csv")
+    return run_cached(manifest, [output], csv_paths, 'concatenate', '1', {},
+                      functools.partial(concatenate, csv_paths, output), force)
+
+def export_stage(species_path, manifest, force):
+    # Wide, typed columnar copy of <alias>_seq_properties.csv for aggregate_species.py and the R scripts
+    paths = species_paths(species_path)
+    properties_csv = output_file(paths, "seq_properties.csv")
+    if not os.path.isfile(properties_csv):
+        return 'skipped'
+    output = output_file(paths, "seq_properties.parquet")
+    return run_cached(manifest, [output], [properties_csv],
+                      'export_seq_properties', script_version(export_seq_properties), {},
+                      lambda: export_seq_properties.write_columnar(export_seq_properties.long_to_wide(properties_csv, paths['alias']), output),
+                      force)
+
+# Per-species stages in the order they run: the whole seqprop pipeline of calc_seqprops_each_species.sh,
+# plus filtering to representative sequences and conservation
+STAGES = {
+    'filter': filter_stage,
+    'linearize': linearize_stage,
+    'properties': properties_stage,
+    'predictors': predictors_stage,
+    'disorder': disorder_stage,
+    'phobius': phobius_stage,
+    'aa_comp_bias': aa_comp_bias_stage,
+    'conservation': conservation_stage,
+    'concatenate': concatenate_stage,
+    'export': export_stage,
+}
+
+def rep_sequence_count(paths):
+    fasta = paths['protein_fasta']
+    return stage_metrics.count_fasta_records(fasta) if os.path.isfile(fasta) else None
+
+def run_stage_function(stage_function, species_path, force):
+    # Each stage loads the manifest itself: a measured stage runs in a child process,
+    # so entries saved by earlier stages are only seen by reading them back from disk
+    manifest = Manifest(species_paths(species_path)['output_dir'])
+    return stage_function(species_path, manifest, force)
+
+def process_species(species_path, stages, force=False, metrics_log=None, profile_dir=None, predictor_shards=1):
+    """Run the selected stages for one species, recording each stage's outcome instead of raising.
+
+    Outputs whose inputs, tool version and parameters are unchanged since
+    the last run are reported as 'cached' and not recomputed. With a
+    metrics_log, each stage runs in its own forked process and its time,
+    peak RSS, I/O and sequence count are appended to it (see stage_metrics.py).
+    """
+    paths = species_paths(species_path)
+    try:
+        os.makedirs(paths['output_dir'], exist_ok=True)
+    except Exception:
+        return [{'stage': 'setup', 'status': 'failed', 'seconds': 0.0, 'error': traceback.format_exc()}]
+    results = []
+    sequences = None
+    for stage in stages:
+        start = time.perf_counter()
+        stage_function = STAGES[stage]
+        if stage == 'predictors':
+            stage_function = functools.partial(predictors_stage, predictor_shards=predictor_shards)
+        try:
+            if metrics_log:
+                # Count the representative proteins once, as soon as the rep FASTA exists
+                if sequences is None:
+                    sequences = rep_sequence_count(paths)
+                status = stage_metrics.run_measured(metrics_log, paths['alias'], stage, run_stage_function,
+                                                    (stage_function, species_path, force), sequences, profile_dir)
+            else:
+                status = run_stage_function(stage_function, species_path, force)
+            error = ''
+        except Exception:
+            status = 'failed'
+            error = traceback.format_exc()
+        results.append({'stage': stage, 'status': status, 'seconds': time.perf_counter() - start, 'error': error})
+        # Later stages depend on earlier outputs, so stop at the first failure
+        if status == 'failed':
+            break
+        # A re-run filter rewrites the rep FASTA, so its sequence count may have changed
+        if stage == 'filter' and status == 'ok':
+            sequences = None
+    return results
+
+def find_species(base_dir, selected=None):
+    """List the species directories under base_dir, optionally restricted to the selected names."""
+    species = sorted(entry.name for entry in os.scandir(base_dir) if entry.is_dir())
+    if selected:
+        species = [name for name in species if name in selected]
+    return species
+
+def write_report(report_path, report):
+    with open(report_path, 'w', newline='') as file:
+        writer = csv.writer(file, delimiter='\t')
+        writer.writerow(['species', 'stage', 'status', 'seconds', 'error'])
+        for species, results in sorted(report.items()):
+            for result in results:
+                error = result['error'].strip().splitlines()[-1] if result['error'] else ''
+                writer.writerow([species, result['stage'], result['status'], f"{result['seconds']:.2f}", error])
+
+def run_all_species(base_dir, stages, workers, selected=None, force=False, metrics_log=None, profile_dir=None, predictor_shards=1):
+    """Process every species directory in parallel and return {species: stage results}."""
+    species_names = find_species(base_dir, selected)
+    report = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_species, os.path.join(base_dir, species), stages, force, metrics_log, profile_dir, predictor_shards): species
+                   for species in species_names}
+        for future in as_completed(futures):
+            species = futures[future]
+            try:
+                report[species] = future.result()
+            except Exception:
+                # The worker itself died (e.g. killed for memory); isolate it to this species
+                report[species] = [{'stage': 'worker', 'status': 'failed', 'seconds': 0.0, 'error': traceback.format_exc()}]
+            failed = [result for result in report[species] if result['status'] == 'failed']
+            print(f"[{len(report)}/{len(species_names)}] {species}: {'FAILED at ' + failed[0]['stage'] if failed else 'done'}")
+    return report
+
+def print_summary(report):
+    counts = {}
+    for results in report.values():
+        for result in results:
+            key = (result['stage'], result['status'])
+            counts[key] = counts.get(key, 0) + 1
+    print(f"\nProcessed {len(report)} species")
+    for (stage, status), count in sorted(counts.items()):
+        print(f"  {stage:<14}{status:<18}{count}")
+    failed = sorted(species for species, results in report.items() if any(result['status'] == 'failed' for result in results))
+    if failed:
+        print(f"Failed species ({len(failed)}): {', '.join(failed)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the per-species pangenome stages across all species in parallel.")
+    parser.add_argument('--base-dir', default=base_dir, help="Directory containing one folder per bacterial species")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of species processed at once")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES), help="Stages to run, in order")
+    parser.add_argument('--species', nargs='+', help="Only process these species")
+    parser.add_argument('--force', action='store_true', help="Recompute every output even if its inputs are unchanged")
+    parser.add_argument('--report', default='run_all_species_report.tsv', help="TSV file for the per-species, per-stage report")
+    parser.add_argument('--metrics-log', help="Append per-species, per-stage resource records to this JSON-lines log")
+    parser.add_argument('--profile-dir', help="With --metrics-log, also write a cProfile dump per species and stage here")
+    parser.add_argument('--predictor-shards', type=int, default=1, help="Phobius shards per species; IUPred3 reads the whole FASTA and runs alongside them")
+    args = parser.parse_args()
+
+    stages = [stage for stage in STAGES if stage in args.stages]
+    metrics_log = os.path.abspath(args.metrics_log) if args.metrics_log else None
+    profile_dir = os.path.abspath(args.profile_dir) if args.profile_dir else None
+    report = run_all_species(args.base_dir, stages, args.workers, args.species, args.force, metrics_log, profile_dir, args.predictor_shards)
+    write_report(args.report, report)
+    print_summary(report)
+    print(f"Report written to {args.report}")
+    if metrics_log:
+        print(f"Stage metrics appended to {metrics_log} (summarise with: python stage_metrics.py summary --log {metrics_log})")
@@ -0,0 +1,161 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from fasta_io import read_fasta, FastaWriter
+from seqprop_cache import Manifest, sha256_file
+
+# Default locations of the external predictors
+IUPRED3 = "/stor/scratch/Ochman/kristen/pangenome/seqprop_pipeline/iupred3/iupred3.py"
+PHOBIUS = "/stor/work/Ochman/hassan/tools/phobius/phobius.pl"
+
+TOOLS = ['iupred3', 'phobius']
+# iupred3.py reads a multi-record FASTA as one concatenated sequence, so scores near a shard edge
+# depend on the neighbouring protein; it runs on the whole FASTA unless more shards are asked for
+IUPRED3_SHARDS = 1
+
+def split_fasta(fasta_path, shard_dir, num_shards, name):
+    """Split a FASTA into up to num_shards contiguous shards of roughly equal size, keeping record order."""
+    target_bytes = os.path.getsize(fasta_path) / num_shards
+    shard_paths = []
+    writer = None
+    shard_bytes = 0
+    for header, sequence in read_fasta(fasta_path):
+        if writer is None or (shard_bytes >= target_bytes and len(shard_paths) < num_shards):
+            if writer is not None:
+                writer.close()
+            shard_paths.append(os.path.join(shard_dir, f"{name}_{len(shard_paths):04d}.fasta"))
+            writer = FastaWriter(shard_paths[-1], line_width=0)
+            shard_bytes = 0
+        writer.write(header, sequence)
+        shard_bytes += len(header) + len(sequence) + 3
+    if writer is not None:
+        writer.close()
+    return shard_paths
+
+def tool_command(tool, shard_path, paths):
+    """Return the command for one tool run on one shard; the tool's stdout is its output."""
+    if tool == 'iupred3':
+        return ['python', paths['iupred3'], shard_path, 'long']
+    return [paths['phobius'], '-short', shard_path]
+
+def run_tool(command, stdout_path):
+    with open(stdout_path, 'wb') as stdout:
+        subprocess.run(command, check=True, stdout=stdout)
+
+def merge_iupred(shard_outputs, output_path):
+    # Keep the first shard's comment header and renumber positions so the merged
+    # file reads like one IUPred3 run over the whole proteome
+    offset = 0
+    with open(output_path, 'w') as merged:
+        for index, shard_output in enumerate(shard_outputs):
+            last_position = 0
+            with open(shard_output, 'r') as file:
+                for line in file:
+                    if line.startswith('#'):
+                        if index == 0:
+                            merged.write(line)
+                        continue
+                    position, separator, rest = line.partition('\t')
+                    if position.isdigit():
+                        last_position = int(position)
+                        merged.write(f"{last_position + offset}{separator}{rest}")
+                    else:
+                        merged.write(line)
+            offset += last_position
+
+def merge_phobius(shard_outputs, output_path):
+    # Every shard starts with the same column header line; keep only the first
+    with open(output_path, 'wb') as merged:
+        for index, shard_output in enumerate(shard_outputs):
+            with open(shard_output, 'rb') as file:
+                if index > 0:
+                    file.readline()
+                merged.write(file.read())
+
+MERGERS = {'iupred3': merge_iupred, 'phobius': merge_phobius}
+
+def output_paths(output_dir, alias):
+    return {
+        'iupred3': os.path.join(output_dir, f"{alias}_iupred3_output.txt"),
+        'phobius': os.path.join(output_dir, f"{alias}_tm.phobius"),
+    }
+
+def run_predictors(protein_fasta, output_dir, alias, tools=TOOLS, num_shards=os.cpu_count(), workers=os.cpu_count(), paths=None,
+                   use_cache=False, manifest=None, iupred3_shards=IUPRED3_SHARDS):
+    """Run the external predictors over FASTA shards concurrently and merge their outputs in order.
+
+    Phobius is split into num_shards shards and IUPred3 into iupred3_shards. A tool
+    with a single shard reads the FASTA itself, so its output is that of a plain run.
+    Returns the list of tools that were actually run (others were up to date in the cache).
+    A caller that already holds the output directory's Manifest can pass it in, so its later saves keep these entries.
+    """
+    paths = paths or {'iupred3': IUPRED3, 'phobius': PHOBIUS}
+    outputs = output_paths(output_dir, alias)
+    tool_inputs = {
+        'iupred3': [protein_fasta],
+        'phobius': [protein_fasta],
+    }
+    tool_shards = {'iupred3': max(iupred3_shards, 1), 'phobius': max(num_shards, 1)}
+    if use_cache and manifest is None:
+        manifest = Manifest(output_dir)
+    versions = {tool: sha256_file(paths[tool]) for tool in tools} if manifest is not None else {}
+    # The shard count is part of the cache key, so a sharded IUPred3 result is never reused as an unsharded one
+    params = {tool: {'shards': tool_shards[tool]} for tool in tools}
+    if manifest is not None:
+        tools = [tool for tool in tools if not manifest.is_fresh([outputs[tool]], tool_inputs[tool], tool, versions[tool], params[tool])]
+    if not tools:
+        return []
+
+    with tempfile.TemporaryDirectory(prefix=f"{alias}_shards_", dir=output_dir) as shard_dir:
+        shards = {}
+        for count in {tool_shards[tool] for tool in tools}:
+            shards[count] = [protein_fasta] if count == 1 else split_fasta(protein_fasta, shard_dir, count, f"protein{count}")
+
+        # Every (tool, shard) pair is an independent subprocess; threads just wait on them
+        jobs = {tool: [] for tool in tools}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for tool in tools:
+                for index, shard_path in enumerate(shards[tool_shards[tool]]):
+                    shard_output = os.path.join(shard_dir, f"{tool}_{index:04d}.out")
+                    jobs[tool].append((executor.submit(run_tool, tool_command(tool, shard_path, paths), shard_output), shard_output))
+
+            for tool in tools:
+                for future, _ in jobs[tool]:
+                    future.result()
+                shard_outputs = [shard_output for _, shard_output in jobs[tool]]
+                if len(shard_outputs) == 1:
+                    shutil.move(shard_outputs[0], outputs[tool])
+                else:
+                    MERGERS[tool](shard_outputs, outputs[tool])
+                if manifest is not None:
+                    manifest.record([outputs[tool]], tool_inputs[tool], tool, versions[tool], params[tool])
+                    manifest.save()
+    return tools
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run IUPred3 and Phobius over FASTA shards in parallel.")
+    parser.add_argument('protein_fasta', help="Linearized protein FASTA file")
+    parser.add_argument('alias', help="Prefix for the output files")
+    parser.add_argument('--output-dir', default='.', help="Directory to write the merged outputs to")
+    parser.add_argument('--tools', nargs='+', choices=TOOLS, default=TOOLS, help="Predictors to run")
+    parser.add_argument('--shards', type=int, default=os.cpu_count(), help="Number of shards the FASTA is split into for Phobius")
+    parser.add_argument('--iupred3-shards', type=int, default=IUPRED3_SHARDS,
+                        help="Number of shards for IUPred3 (more than 1 changes the scores near shard edges)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of tool processes run at once")
+    parser.add_argument('--cache', action='store_true', help="Skip tools whose outputs are up to date in the output directory's manifest")
+    parser.add_argument('--iupred3', default=IUPRED3, help="Path to iupred3.py")
+    parser.add_argument('--phobius', default=PHOBIUS, help="Path to phobius.pl")
+    args = parser.parse_args()
+
+    paths = {'iupred3': args.iupred3, 'phobius': args.phobius}
+    try:
+        ran = run_predictors(args.protein_fasta, args.output_dir, args.alias, args.tools, args.shards, args.workers, paths, args.cache,
+                             iupred3_shards=args.iupred3_shards)
+    except subprocess.CalledProcessError as error:
+        print(f"Predictor failed with exit code {error.returncode}: {' '.join(error.cmd)}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Ran {', '.join(ran) if ran else 'no predictors (all outputs up to date)'}")
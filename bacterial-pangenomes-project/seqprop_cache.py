@@ -0,0 +1,175 @@
+"""Content-hash manifest cache for per-species property outputs.
+
+Each rep_seq_properties directory holds a manifest.json recording, for
+every output file, the hashes of the inputs it was made from plus the
+tool, tool version and parameters used. An output is only recomputed
+when it is missing or any of those have changed.
+
+From the shell scripts, wrap an expensive command with:
+
+    python seqprop_cache.py run --output OUT --input IN [--input IN ...] \\
+        --tool NAME --version-file TOOL_PATH [--version-file HELPER ...] [--param P ...] [--stdout] -- COMMAND ...
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+
+MANIFEST_NAME = 'manifest.json'
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def local_modules(module):
+    """Return the module and every module from its own directory it imports, directly or through other local modules."""
+    directory = os.path.dirname(os.path.abspath(module.__file__))
+    found = {}
+    pending = [module]
+    while pending:
+        current = pending.pop()
+        if current.__name__ in found:
+            continue
+        found[current.__name__] = current
+        for value in vars(current).values():
+            # Both "import fasta_io" and "from fasta_io import read_fasta" make fasta_io a dependency
+            dependency = value if inspect.ismodule(value) else sys.modules.get(getattr(value, '__module__', None) or '')
+            path = getattr(dependency, '__file__', None)
+            if path and os.path.dirname(os.path.abspath(path)) == directory:
+                pending.append(dependency)
+    return [found[name] for name in sorted(found)]
+
+
+def module_version(module):
+    """Hash of a module's source and of the local helper modules it depends on, so editing any of them invalidates the cache."""
+    digest = hashlib.sha256()
+    for dependency in local_modules(module):
+        digest.update(f"{dependency.__name__}:{sha256_file(dependency.__file__)}\n".encode())
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Input hashes, tool versions and parameters for the outputs in one directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.entries = {}
+        self.hashes = {}
+        if os.path.isfile(self.path):
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+            self.entries = data.get('outputs', {})
+            self.hashes = data.get('hashes', {})
+
+    def key(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.directory))
+
+    def file_hash(self, path):
+        # Re-hash only when size or modification time changed since the last run
+        stat = os.stat(path)
+        key = self.key(path)
+        known = self.hashes.get(key)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        digest = sha256_file(path)
+        self.hashes[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def signature(self, inputs, tool, version, params):
+        return {
+            'inputs': {self.key(path): self.file_hash(path) for path in inputs},
+            'tool': tool,
+            'version': version,
+            'params': params,
+        }
+
+    def is_fresh(self, outputs, inputs, tool, version, params=None):
+        """True if every output exists and was recorded with these exact inputs, tool, version and params."""
+        if not all(os.path.isfile(path) for path in outputs):
+            return False
+        if not all(os.path.isfile(path) for path in inputs):
+            return False
+        signature = self.signature(inputs, tool, version, params or {})
+        return all(self.entries.get(self.key(path)) == signature for path in outputs)
+
+    def record(self, outputs, inputs, tool, version, params=None):
+        signature = self.signature(inputs, tool, version, params or {})
+        for path in outputs:
+            self.entries[self.key(path)] = signature
+
+    def save(self):
+        # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'outputs': self.entries, 'hashes': self.hashes}, file, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+
+def run_cached(manifest, outputs, inputs, tool, version, params, compute, force=False):
+    """Call compute() unless the outputs are fresh; returns 'cached' or 'ok'."""
+    if not force and manifest.is_fresh(outputs, inputs, tool, version, params):
+        return 'cached'
+    compute()
+    manifest.record(outputs, inputs, tool, version, params)
+    manifest.save()
+    return 'ok'
+
+
+def run_command(args):
+    outputs = args.output
+    manifest = Manifest(args.manifest_dir or os.path.dirname(os.path.abspath(outputs[0])))
+    if args.version_file:
+        version = sha256_file(args.version_file[0]) if len(args.version_file) == 1 else \
+            hashlib.sha256(''.join(sha256_file(path) for path in args.version_file).encode()).hexdigest()
+    else:
+        version = args.version
+    params = {'command': args.command, 'extra': args.param}
+
+    def compute():
+        if args.stdout:
+            with open(outputs[0], 'wb') as stdout:
+                subprocess.run(args.command, stdout=stdout, check=True)
+        else:
+            subprocess.run(args.command, check=True)
+
+    try:
+        status = run_cached(manifest, outputs, args.input, args.tool, version, params, compute, args.force)
+    except subprocess.CalledProcessError as error:
+        print(f"{args.tool} failed with exit code {error.returncode}", file=sys.stderr)
+        sys.exit(error.returncode)
+    if status == 'cached':
+        print(f"{args.tool}: inputs unchanged, skipping {', '.join(outputs)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a pipeline command only when its outputs are stale.")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    run_parser = subparsers.add_parser('run', help="Run COMMAND unless its outputs are up to date")
+    run_parser.add_argument('--output', action='append', required=True, help="Output file made by the command (repeatable)")
+    run_parser.add_argument('--input', action='append', default=[], help="Input file read by the command (repeatable)")
+    run_parser.add_argument('--tool', required=True, help="Name of the tool, e.g. iupred3")
+    run_parser.add_argument('--version', default='', help="Tool version string")
+    run_parser.add_argument('--version-file', action='append', help="Tool executable or script whose hash identifies its version; "
+                                                                     "repeat for helper modules it imports")
+    run_parser.add_argument('--param', action='append', default=[], help="Extra parameter that affects the output (repeatable)")
+    run_parser.add_argument('--manifest-dir', help="Directory holding manifest.json (default: the first output's directory)")
+    run_parser.add_argument('--stdout', action='store_true', help="Redirect the command's stdout into the first output")
+    run_parser.add_argument('--force', action='store_true', help="Run even if the outputs are up to date")
+    run_parser.add_argument('command', nargs=argparse.REMAINDER, help="Command to run, after --")
+    args = parser.parse_args()
+    if args.command and args.command[0] == '--':
+        args.command = args.command[1:]
+    if not args.command:
+        parser.error("no command given")
+    run_command(args)
@@ -0,0 +1,276 @@
+"""Per-stage timing and resource records for the seqprop pipeline.
+
+Every wrapped stage appends one JSON line to a log with the species, stage,
+status, wall and CPU time, peak RSS, bytes read and written and the number
+of sequences processed. From the shell scripts, wrap a stage with:
+
+    python stage_metrics.py run --log LOG --species SPECIES --stage NAME \\
+        [--input IN ...] [--output OUT ...] [--sequences N | --fasta FASTA] \\
+        [--profile-dir DIR] [--stdout] -- COMMAND ...
+
+and find the bottlenecks with:
+
+    python stage_metrics.py summary --log LOG [LOG ...]
+
+For commands, bytes read and written are the sizes of the declared input
+and output files. Python stages measured with run_measured() run in a
+forked child and use its own I/O counters from /proc/self/io where available.
+"""
+import argparse
+import cProfile
+import json
+import os
+import pickle
+import platform
+import runpy
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime, timezone
+
+READ_BLOCK_BYTES = 1024 * 1024
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+MAXRSS_TO_MB = 1 / (1024 * 1024) if sys.platform == 'darwin' else 1 / 1024
+
+
+def count_fasta_records(path):
+    """Count the '>' header lines of a FASTA without parsing the sequences."""
+    count = 0
+    previous = b'\n'
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(READ_BLOCK_BYTES), b''):
+            count += block.count(b'\n>') + (previous == b'\n' and block[:1] == b'>')
+            previous = block[-1:]
+    return count
+
+
+def total_size(paths):
+    return sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+
+
+def profile_path(profile_dir, species, stage):
+    os.makedirs(profile_dir, exist_ok=True)
+    return os.path.join(profile_dir, f"{species}.{stage}.prof")
+
+
+def append_record(log_path, record):
+    # One write per record keeps lines whole when several species append to the same log
+    line = json.dumps(record) + '\n'
+    with open(log_path, 'a') as log:
+        log.write(line)
+
+
+def make_record(species, stage, status, wall_seconds, cpu_seconds, max_rss_mb, bytes_read, bytes_written, sequences):
+    return {
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'species': species,
+        'stage': stage,
+        'status': status,
+        'wall_seconds': round(wall_seconds, 4),
+        'cpu_seconds': round(cpu_seconds, 4),
+        'max_rss_mb': round(max_rss_mb, 1),
+        'bytes_read': bytes_read,
+        'bytes_written': bytes_written,
+        'sequences': sequences,
+    }
+
+
+def read_proc_io():
+    """Return (bytes read, bytes written) by this process from /proc/self/io, or None if unavailable."""
+    try:
+        with open('/proc/self/io', 'r') as file:
+            counters = dict(line.split(': ') for line in file.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def run_measured(log_path, species, stage, function, args=(), sequences=None, profile_dir=None):
+    """Run a Python stage, function(*args), in a forked child, log its record and return what the function returned.
+
+    The returned value is logged as the stage status. Wall and CPU time, peak
+    RSS and I/O are the child's own, so a stage never reports memory used by
+    earlier stages or species handled by the same worker process.
+    Raises RuntimeError with the child's traceback if the function raised or the child died.
+    """
+    # Anything still buffered would otherwise be printed by both processes
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        exit_code = 1
+        try:
+            profiler = cProfile.Profile() if profile_dir else None
+            try:
+                if profiler:
+                    profiler.enable()
+                try:
+                    outcome = ('ok', function(*args))
+                finally:
+                    if profiler:
+                        profiler.disable()
+                        profiler.dump_stats(profile_path(profile_dir, species, stage))
+            except BaseException:
+                outcome = ('error', traceback.format_exc())
+            with os.fdopen(write_fd, 'wb') as pipe:
+                pickle.dump((outcome, read_proc_io()), pipe)
+            exit_code = 0 if outcome[0] == 'ok' else 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    os.close(write_fd)
+    # Read before waiting so a large result can never block the child on a full pipe
+    with os.fdopen(read_fd, 'rb') as pipe:
+        payload = pipe.read()
+    _, status, usage = os.wait4(pid, 0)
+    wall_seconds = time.perf_counter() - start
+    exit_code = os.waitstatus_to_exitcode(status)
+    (kind, value), io = pickle.loads(payload) if payload else (('error', f"stage process exited with status {exit_code}\n"), None)
+    bytes_read, bytes_written = io if io else (None, None)
+    append_record(log_path, make_record(species, stage, value if kind == 'ok' else 'failed', wall_seconds,
+                                        usage.ru_utime + usage.ru_stime, usage.ru_maxrss * MAXRSS_TO_MB,
+                                        bytes_read, bytes_written, sequences))
+    if kind == 'error':
+        raise RuntimeError(f"{stage} failed in its measuring process:\n{value}")
+    return value
+
+
+def profile_script(profile_file, argv):
+    """Run a Python script as __main__ under cProfile, keeping its exit status (python -m cProfile swallows sys.exit)."""
+    sys.argv = argv
+    sys.path.insert(0, os.path.dirname(os.path.abspath(argv[0])))
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(runpy.run_path, argv[0], run_name='__main__')
+    finally:
+        profiler.dump_stats(profile_file)
+
+
+def profiled_command(command, profile_file):
+    # Run "python script.py ..." under cProfile; other commands are left as they are
+    if len(command) > 1 and os.path.basename(command[0]).startswith('python') and command[1].endswith('.py'):
+        return [command[0], os.path.abspath(__file__), 'profile', '--output', profile_file, '--'] + command[1:]
+    return command
+
+
+def run_stage(log_path, species, stage, command, inputs=(), outputs=(), sequences=None, profile_dir=None, stdout=False):
+    """Run a stage's command in a child process, log its record and return its exit code."""
+    if profile_dir:
+        command = profiled_command(command, profile_path(profile_dir, species, stage))
+    start = time.perf_counter()
+    stdout_file = open(outputs[0], 'wb') if stdout else None
+    try:
+        process = subprocess.Popen(command, stdout=stdout_file)
+        # wait4 returns this child's resource usage, including any grandchildren it waited for
+        _, status, usage = os.wait4(process.pid, 0)
+    finally:
+        if stdout_file:
+            stdout_file.close()
+    wall_seconds = time.perf_counter() - start
+    process.returncode = exit_code = os.waitstatus_to_exitcode(status)
+    append_record(log_path, make_record(species, stage, 'ok' if exit_code == 0 else f'failed ({exit_code})',
+                                        wall_seconds, usage.ru_utime + usage.ru_stime, usage.ru_maxrss * MAXRSS_TO_MB,
+                                        total_size(inputs), total_size(outputs), sequences))
+    return exit_code
+
+
+def load_records(log_paths):
+    records = []
+    for log_path in log_paths:
+        with open(log_path, 'r') as log:
+            records.extend(json.loads(line) for line in log if line.strip())
+    return records
+
+
+def group_totals(records, key):
+    """Sum wall time, CPU time, bytes and sequences per value of key, slowest first."""
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record[key], {'runs': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'max_rss_mb': 0.0,
+                                                'bytes_read': 0, 'bytes_written': 0, 'sequences': 0})
+        total['runs'] += 1
+        total['wall_seconds'] += record['wall_seconds']
+        total['cpu_seconds'] += record['cpu_seconds']
+        total['max_rss_mb'] = max(total['max_rss_mb'], record['max_rss_mb'])
+        total['bytes_read'] += record['bytes_read'] or 0
+        total['bytes_written'] += record['bytes_written'] or 0
+        total['sequences'] += record['sequences'] or 0
+    return sorted(totals.items(), key=lambda item: item[1]['wall_seconds'], reverse=True)
+
+
+def print_summary(records, top=10):
+    total_wall = sum(record['wall_seconds'] for record in records) or 1.0
+    print(f"{len(records)} stage runs, {len({record['species'] for record in records})} species, "
+          f"{total_wall / 3600:.2f} h of stage wall time\n")
+
+    print("Stages by total wall time")
+    print(f"{'stage':<22}{'runs':>6}{'wall s':>12}{'share':>7}{'cpu/wall':>9}{'peak MB':>9}{'MB read':>10}{'seq/s':>10}")
+    for stage, total in group_totals(records, 'stage'):
+        rate = total['sequences'] / total['wall_seconds'] if total['wall_seconds'] else 0.0
+        print(f"{stage:<22}{total['runs']:>6}{total['wall_seconds']:>12.1f}{total['wall_seconds'] / total_wall:>7.1%}"
+              f"{total['cpu_seconds'] / max(total['wall_seconds'], 1e-9):>9.2f}{total['max_rss_mb']:>9.0f}"
+              f"{total['bytes_read'] / 1e6:>10.1f}{rate:>10.0f}")
+
+    print(f"\nSlowest {top} species")
+    print(f"{'species':<40}{'wall s':>12}{'peak MB':>9}{'sequences':>11}  slowest stage")
+    by_species = dict(group_totals(records, 'species'))
+    for species, total in list(by_species.items())[:top]:
+        slowest = max((record for record in records if record['species'] == species), key=lambda record: record['wall_seconds'])
+        num_sequences = max((record['sequences'] or 0 for record in records if record['species'] == species), default=0)
+        print(f"{species:<40}{total['wall_seconds']:>12.1f}{total['max_rss_mb']:>9.0f}{num_sequences:>11}"
+              f"  {slowest['stage']} ({slowest['wall_seconds']:.1f} s)")
+
+    print(f"\nSlowest {top} stage runs")
+    print(f"{'species':<40}{'stage':<22}{'wall s':>10}{'cpu s':>10}{'peak MB':>9}  status")
+    for record in sorted(records, key=lambda record: record['wall_seconds'], reverse=True)[:top]:
+        print(f"{record['species']:<40}{record['stage']:<22}{record['wall_seconds']:>10.1f}{record['cpu_seconds']:>10.1f}"
+              f"{record['max_rss_mb']:>9.0f}  {record['status']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and summarise per-stage resource use of the seqprop pipeline.")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    run_parser = subparsers.add_parser('run', help="Run COMMAND and append its stage record to the log")
+    run_parser.add_argument('--log', required=True, help="JSON-lines log the record is appended to")
+    run_parser.add_argument('--species', required=True, help="Species (or alias) the stage ran for")
+    run_parser.add_argument('--stage', required=True, help="Stage name, e.g. instability")
+    run_parser.add_argument('--input', action='append', default=[], help="Input file read by the command (repeatable)")
+    run_parser.add_argument('--output', action='append', default=[], help="Output file made by the command (repeatable)")
+    run_parser.add_argument('--sequences', type=int, help="Number of sequences the stage processes")
+    run_parser.add_argument('--fasta', help="Count the sequences of this FASTA instead of giving --sequences")
+    run_parser.add_argument('--profile-dir', help="Write a cProfile dump for Python commands to DIR/<species>.<stage>.prof")
+    run_parser.add_argument('--stdout', action='store_true', help="Redirect the command's stdout into the first output")
+    run_parser.add_argument('command', nargs=argparse.REMAINDER, help="Command to run, after --")
+
+    profile_parser = subparsers.add_parser('profile', help="Run a Python script under cProfile (used by run --profile-dir)")
+    profile_parser.add_argument('--output', required=True, help="cProfile dump to write")
+    profile_parser.add_argument('command', nargs=argparse.REMAINDER, help="Script and its arguments, after --")
+
+    summary_parser = subparsers.add_parser('summary', help="Show the slowest stages and species")
+    summary_parser.add_argument('--log', nargs='+', required=True, help="JSON-lines log(s) to summarise")
+    summary_parser.add_argument('--top', type=int, default=10, help="Number of species and stage runs to list")
+    args = parser.parse_args()
+
+    if args.action == 'summary':
+        print_summary(load_records(args.log), args.top)
+        sys.exit(0)
+
+    if args.command and args.command[0] == '--':
+        args.command = args.command[1:]
+    if not args.command:
+        parser.error("no command given")
+    if args.action == 'profile':
+        profile_script(args.output, args.command)
+        sys.exit(0)
+    if args.stdout and not args.output:
+        parser.error("--stdout needs an --output")
+    sequences = count_fasta_records(args.fasta) if args.fasta else args.sequences
+    sys.exit(run_stage(args.log, args.species, args.stage, args.command, args.input, args.output,
+                       sequences, args.profile_dir, args.stdout))
@@ -0,0 +1,42 @@
+"""Check calculate_cai.py against hand-computed CAI values.
+
+data/cai_test_expected.txt gives the CAI of each CDS in data/cai_test.fasta,
+scored against the synthetic data/cai_test.cut, in EMBOSS cai's
+"Sequence: NAME CAI: VALUE" layout. The values were not produced by EMBOSS.
+They were worked out codon by codon from the rules calculate_cai.py follows:
+- w is a codon's count divided by the most used synonymous codon's count.
+- Stop codons and codons with w = 0 are skipped.
+- Met and Trp (w = 1) are counted.
+- A CDS with no scorable codon gets NA.
+"""
+import csv
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculate_cai
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def read_expected_cai(path):
+    with open(path, 'r') as file:
+        return {match.group(1): match.group(2) for match in re.finditer(r'Sequence: (\S+) CAI: ([0-9.]+|NA)', file.read())}
+
+
+def test_cai_matches_expected_values(tmp_path):
+    expected = read_expected_cai(os.path.join(DATA_DIR, 'cai_test_expected.txt'))
+    output_csv = str(tmp_path / 'cai.csv')
+    calculate_cai.calculate_cai(os.path.join(DATA_DIR, 'cai_test.fasta'), output_csv, os.path.join(DATA_DIR, 'cai_test.cut'))
+    with open(output_csv, 'r') as file:
+        rows = [(gene, value) for gene, _, value in csv.reader(file)]
+
+    # One row per CDS, in input order, including those without a CAI
+    assert [gene for gene, _ in rows] == list(expected)
+    for gene, value in rows:
+        if expected[gene] == 'NA':
+            assert value == 'NA', gene
+        else:
+            # Values are printed with three decimals
+            assert abs(float(value) - float(expected[gene])) <= 0.001, gene
@@ -0,0 +1,44 @@
+"""Lookups and cache invalidation of the persisted clusters.tsv index."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cluster_index
+
+CLUSTERS = [('WP_2.1', 'WP_2.1'), ('WP_2.1', 'WP_9.1'), ('WP_2.1', 'WP_5.1'), ('WP_7.1', 'WP_7.1'), ('WP_7.1', 'WP_1.1')]
+
+
+def make_species(tmp_path, num_strains):
+    species_path = tmp_path / 'Sp_a'
+    proteins_dir = species_path / 'Sp_a_proteins'
+    (proteins_dir / 'clustering').mkdir(parents=True)
+    for strain in range(1, num_strains + 1):
+        (proteins_dir / f"Sp_a_{strain}_protein.faa").write_text('')
+    (proteins_dir / 'clustering' / 'clusters.tsv').write_text(''.join(f"{rep}\t{member}\n" for rep, member in CLUSTERS))
+    return str(species_path), proteins_dir
+
+
+def test_representative_of(tmp_path):
+    species_path, _ = make_species(tmp_path, 4)
+    index = cluster_index.species_cluster_index(species_path)
+    for rep, member in CLUSTERS:
+        assert index.representative_of(member) == rep
+    assert index.representative_of('WP_3.1') is None
+    assert list(index.conservation()) == [('WP_2.1', 0.75), ('WP_7.1', 0.5)]
+
+
+def test_strains_recounted_only_when_proteins_dir_changes(tmp_path, monkeypatch):
+    species_path, proteins_dir = make_species(tmp_path, 4)
+    cluster_index.species_cluster_index(species_path)
+
+    def fail(*args):
+        raise AssertionError("proteins directory rescanned")
+    with monkeypatch.context() as patch:
+        patch.setattr(cluster_index, 'count_strains', fail)
+        assert cluster_index.species_cluster_index(species_path).num_strains == 4
+
+    (proteins_dir / "Sp_a_5_protein.faa").write_text('')
+    os.utime(proteins_dir, ns=(0, os.stat(proteins_dir).st_mtime_ns + 1))
+    index = cluster_index.species_cluster_index(species_path)
+    assert index.num_strains == 5
+    assert index.representative_of('WP_1.1') == 'WP_7.1'
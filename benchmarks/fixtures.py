@@ -0,0 +1,251 @@
+"""Seeded generators for synthetic benchmark inputs.
+
+Each generator writes a realistic stand-in for one of the pipelines' inputs
+(protein and CDS FASTA, an EMBOSS codon usage table, IUPred3 and Phobius
+output, an MMseqs2 species directory, MGF spectra, kallisto abundance.tsv runs). The same seed and record count
+always produce the same files, so timings are comparable across commits.
+"""
+import argparse
+import os
+import numpy as np
+
+AMINO_ACIDS = np.frombuffer(b'ACDEFGHIKLMNPQRSTVWY', dtype=np.uint8)
+# Approximate residue frequencies of bacterial proteomes, in AMINO_ACIDS order
+AA_FREQUENCIES = np.array([9.5, 1.0, 5.2, 5.8, 3.9, 7.4, 2.2, 6.0, 4.6, 10.6,
+                           2.6, 4.0, 4.4, 4.4, 5.6, 5.8, 5.3, 7.1, 1.4, 2.9])
+AA_FREQUENCIES = AA_FREQUENCIES / AA_FREQUENCIES.sum()
+PHOBIUS_HEADER = "SEQENCE ID                     TM SP PREDICTION\n"
+ABUNDANCE_HEADER = "target_id\tlength\teff_length\test_counts\ttpm\n"
+KALLISTO_KMERS = [7, 11, 15, 19, 23, 27, 31]
+KALLISTO_SAMPLES = 4
+# Records generated (and written) at a time, so 10M-record fixtures stay within memory
+BATCH_RECORDS = 100000
+LINE_WIDTH = 80
+# Standard genetic code, codons in TCAG order
+CODON_BASES = 'TCAG'
+GENETIC_CODE = 'FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG'
+CODONS = [first + second + third for first in CODON_BASES for second in CODON_BASES for third in CODON_BASES]
+
+
+def protein_ids(start, stop):
+    return [f"WP_{number:09d}.1" for number in range(start, stop)]
+
+
+def protein_lengths(rng, count):
+    # Bacterial proteins: lognormal around ~300 aa, clipped to a plausible range
+    return np.clip(rng.lognormal(5.6, 0.5, count), 30, 3000).astype(np.int64)
+
+
+def iter_protein_batches(num_records, seed):
+    """Yield (ids, lengths, residues) batches; the same seed always gives the same proteome."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_records, BATCH_RECORDS):
+        stop = min(start + BATCH_RECORDS, num_records)
+        lengths = protein_lengths(rng, stop - start)
+        residues = AMINO_ACIDS[rng.choice(len(AMINO_ACIDS), size=int(lengths.sum()), p=AA_FREQUENCIES)]
+        residues[np.cumsum(lengths) - lengths] = ord('M')  # Every protein starts with methionine
+        yield protein_ids(start, stop), lengths, residues.tobytes()
+
+
+def write_protein_fasta(path, num_records, seed=0):
+    """Write an NCBI-style protein FASTA with sequences wrapped at 80 residues."""
+    with open(path, 'wb') as output:
+        for ids, lengths, residues in iter_protein_batches(num_records, seed):
+            chunks = []
+            offset = 0
+            for protein_id, length in zip(ids, lengths.tolist()):
+                sequence = residues[offset:offset + length]
+                offset += length
+                chunks.append(f">{protein_id} hypothetical protein [Synthetic bacterium]\n".encode())
+                chunks.extend(sequence[i:i + LINE_WIDTH] + b'\n' for i in range(0, length, LINE_WIDTH))
+            output.write(b''.join(chunks))
+
+
+def write_cds_fasta(path, num_records, seed=0):
+    """Write the CDSs of write_protein_fasta's proteome (random synonymous codons plus a stop codon)."""
+    rng = np.random.default_rng(seed + 6)
+    # Synonymous codons of every residue byte, padded to six columns
+    synonymous = np.zeros((256, 6), dtype='S3')
+    num_synonymous = np.zeros(256, dtype=np.int64)
+    for codon, amino_acid in zip(CODONS, GENETIC_CODE):
+        residue = ord(amino_acid)
+        synonymous[residue, num_synonymous[residue]] = codon
+        num_synonymous[residue] += 1
+    with open(path, 'wb') as output:
+        for ids, lengths, residues in iter_protein_batches(num_records, seed):
+            encoded = np.frombuffer(residues, dtype=np.uint8)
+            choices = (rng.random(len(encoded)) * num_synonymous[encoded]).astype(np.int64)
+            codons = synonymous[encoded, choices].tobytes()
+            stops = synonymous[ord('*'), rng.integers(0, 3, len(ids))].tolist()
+            chunks = []
+            offset = 0
+            for protein_id, length, stop in zip(ids, lengths.tolist(), stops):
+                sequence = codons[3 * offset:3 * (offset + length)] + stop
+                offset += length
+                chunks.append(f">{protein_id} hypothetical protein [Synthetic bacterium]\n".encode())
+                chunks.extend(sequence[i:i + LINE_WIDTH] + b'\n' for i in range(0, len(sequence), LINE_WIDTH))
+            output.write(b''.join(chunks))
+
+
+def write_codon_table(path, num_records, seed=0):
+    """Write an EMBOSS .cut codon usage table with seeded counts (num_records is not used)."""
+    rng = np.random.default_rng(seed + 7)
+    counts = rng.integers(1, 50000, len(CODONS)).tolist()
+    totals = {}
+    for amino_acid, count in zip(GENETIC_CODE, counts):
+        totals[amino_acid] = totals.get(amino_acid, 0) + count
+    with open(path, 'w') as output:
+        output.write(f"#Species: Synthetic bacterium\n#CdsCount: 1000\n\n#Coding GC 50.00%\n\n"
+                     f"#Codon AA Fraction Frequency Number\n")
+        for codon, amino_acid, count in sorted(zip(CODONS, GENETIC_CODE, counts)):
+            output.write(f"{codon}    {amino_acid}     {count / totals[amino_acid]:.3f}    {count / sum(counts) * 1000:.3f}  {count}\n")
+
+
+def write_cds_lengths(path, num_records, seed=0):
+    """Write the <alias>_length.csv matching write_protein_fasta (CDS length includes the stop codon)."""
+    with open(path, 'w') as output:
+        for ids, lengths, _ in iter_protein_batches(num_records, seed):
+            output.write(''.join(f"{protein_id},length,{3 * (length + 1)}\n" for protein_id, length in zip(ids, lengths.tolist())))
+
+
+def write_iupred_output(path, num_records, seed=0):
+    """Write IUPred3 long-mode output covering every residue of write_protein_fasta's proteome."""
+    rng = np.random.default_rng(seed + 1)
+    position = 0
+    with open(path, 'w') as output:
+        output.write("# IUPred3: synthetic benchmark output\n# POS\tRES\tIUPRED2\n")
+        for _, _, residues in iter_protein_batches(num_records, seed):
+            scores = rng.beta(0.8, 2.0, len(residues))
+            positions = range(position + 1, position + len(residues) + 1)
+            output.write(''.join(f"{pos}\t{chr(residue)}\t{score:.4f}\n"
+                                 for pos, residue, score in zip(positions, residues, scores.tolist())))
+            position += len(residues)
+
+
+def phobius_prediction(rng, length, num_tm, signal_peptide):
+    """A Phobius -short topology string and its number of transmembrane segments (at most num_tm)."""
+    parts = []
+    position = 1
+    if signal_peptide:
+        parts.append("n1-5h6-17c18-22/23")
+        position = 23
+    side = 'o' if signal_peptide else 'i'
+    num_segments = 0
+    for _ in range(num_tm):
+        start = position + int(rng.integers(5, 30))
+        end = start + 20
+        if end >= length:
+            break
+        parts.append(f"{side}{start}-{end}")
+        side = 'i' if side == 'o' else 'o'
+        position = end
+        num_segments += 1
+    parts.append(side)
+    return ''.join(parts), num_segments
+
+
+def write_phobius_short(path, num_records, seed=0):
+    """Write Phobius -short output for write_protein_fasta's proteome (~25% membrane, ~10% signal peptide)."""
+    rng = np.random.default_rng(seed + 2)
+    with open(path, 'w') as output:
+        output.write(PHOBIUS_HEADER)
+        for ids, lengths, _ in iter_protein_batches(num_records, seed):
+            num_tms = np.where(rng.random(len(ids)) < 0.25, rng.integers(1, 13, len(ids)), 0)
+            signal_peptides = rng.random(len(ids)) < 0.1
+            lines = []
+            for protein_id, length, num_tm, signal_peptide in zip(ids, lengths.tolist(), num_tms.tolist(), signal_peptides.tolist()):
+                prediction, num_segments = phobius_prediction(rng, length, num_tm, signal_peptide)
+                lines.append(f"{protein_id:<30} {num_segments:>2}  {'Y' if signal_peptide else '0'} {prediction}\n")
+            output.write(''.join(lines))
+
+
+def write_species_clusters(species_path, num_records, num_strains=50, seed=0):
+    """Write an MMseqs2 species directory: clusters.tsv plus empty per-strain protein files for the strain count."""
+    rng = np.random.default_rng(seed + 3)
+    species_dir = os.path.basename(os.path.normpath(species_path))
+    proteins_dir = os.path.join(species_path, f"{species_dir}_proteins")
+    os.makedirs(os.path.join(proteins_dir, "clustering"), exist_ok=True)
+    for strain in range(1, num_strains + 1):
+        open(os.path.join(proteins_dir, f"{species_dir}_{strain}_protein.faa"), 'w').close()
+
+    with open(os.path.join(proteins_dir, "clustering", "clusters.tsv"), 'w') as output:
+        written = 0
+        next_id = 0
+        while written < num_records:
+            # Cluster sizes are skewed: many strain-specific genes, a core genome present in every strain
+            sizes = np.minimum(rng.zipf(1.5, BATCH_RECORDS), num_strains)
+            lines = []
+            for size in sizes.tolist():
+                size = min(size, num_records - written)
+                if size <= 0:
+                    break
+                rep = f"WP_{next_id:09d}.1"
+                lines.extend(f"{rep}\tWP_{member:09d}.1\n" for member in range(next_id, next_id + size))
+                next_id += size
+                written += size
+            output.write(''.join(lines))
+
+
+def write_mgf(path, num_records, seed=0, num_peptides=None):
+    """Write an MGF file of num_records identified spectra drawn from a pool of peptides."""
+    rng = np.random.default_rng(seed + 4)
+    num_peptides = num_peptides or max(1, num_records // 5)
+    lengths = rng.integers(7, 25, num_peptides)
+    codes = AMINO_ACIDS[rng.choice(len(AMINO_ACIDS), size=int(lengths.sum()), p=AA_FREQUENCIES)].tobytes().decode()
+    ends = np.cumsum(lengths).tolist()
+    peptides = [codes[end - length:end] for end, length in zip(ends, lengths.tolist())]
+    elution = rng.uniform(300, 6000, num_peptides)
+
+    with open(path, 'w') as output:
+        for start in range(0, num_records, BATCH_RECORDS):
+            stop = min(start + BATCH_RECORDS, num_records)
+            picks = rng.integers(0, num_peptides, stop - start).tolist()
+            jitter = rng.normal(0, 40, stop - start).tolist()
+            spectra = []
+            for scan, pick, shift in zip(range(start, stop), picks, jitter):
+                peptide = peptides[pick]
+                oxidation = ','.join(f"{i + 1}-[Oxidation (M)]" for i, residue in enumerate(peptide) if residue == 'M')
+                spectra.append(f"BEGIN IONS\nTITLE=synthetic.{scan}.{scan}.2\nPEPMASS=812.4{scan % 10}\nCHARGE=2+\n"
+                               f"SEQ={peptide}\nUSER03={oxidation}\nRTINSECONDS={elution[pick] + shift:.3f}\n"
+                               f"175.119 1520.0\n262.151 840.0\n363.198 2210.0\nEND IONS\n\n")
+            output.write(''.join(spectra))
+
+
+def write_kallisto_runs(run_dir, num_records, seed=0):
+    """Write <sample>_run<k>/abundance.tsv for every sample and k-mer, num_records rows in total."""
+    rng = np.random.default_rng(seed + 5)
+    num_targets = max(1, num_records // (KALLISTO_SAMPLES * len(KALLISTO_KMERS)))
+    targets = [f"gene_{number:08d}" for number in range(num_targets)]
+    target_lengths = rng.integers(150, 6000, num_targets).tolist()
+    for kmer in KALLISTO_KMERS:
+        for sample in range(1, KALLISTO_SAMPLES + 1):
+            sample_dir = os.path.join(run_dir, f"S{sample}_run{kmer}")
+            os.makedirs(sample_dir, exist_ok=True)
+            counts = np.where(rng.random(num_targets) < 0.3, 0.0, np.round(rng.lognormal(2, 2, num_targets), 5)).tolist()
+            with open(os.path.join(sample_dir, 'abundance.tsv'), 'w') as output:
+                output.write(ABUNDANCE_HEADER)
+                output.write(''.join(f"{target}\t{length}\t{max(length - kmer, 1)}\t{count}\t{count / 10:.6g}\n"
+                                     for target, length, count in zip(targets, target_lengths, counts)))
+
+
+GENERATORS = {
+    'proteins': write_protein_fasta,
+    'cds': write_cds_fasta,
+    'codon_table': write_codon_table,
+    'lengths': write_cds_lengths,
+    'iupred': write_iupred_output,
+    'phobius': write_phobius_short,
+    'species': write_species_clusters,
+    'mgf': write_mgf,
+    'kallisto': write_kallisto_runs,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write one synthetic benchmark input.")
+    parser.add_argument('fixture', choices=list(GENERATORS))
+    parser.add_argument('path', help="Output file (or directory for species and kallisto)")
+    parser.add_argument('num_records', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    GENERATORS[args.fixture](args.path, args.num_records, seed=args.seed)
@@ -0,0 +1,223 @@
+"""Time the pipelines' entry points on seeded synthetic inputs.
+
+Every benchmark runs the real script in a child process, so the timings and
+peak RSS include interpreter start-up and imports, exactly as the shell
+pipelines see them. Results are appended as JSON lines tagged with the git
+commit, so runs from different commits can be compared with `compare`.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PANGENOME_DIR = os.path.join(REPO_DIR, 'bacterial-pangenomes-project')
+PROTEOMICS_DIR = os.path.join(REPO_DIR, 'shotgun-proteomics-pipeline')
+KALLISTO_DIR = os.path.join(REPO_DIR, 'do-no-harm', 'kallisto')
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000, '1M': 1000000, '10M': 10000000}
+DEFAULT_RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.jsonl')
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIXTURES_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures.py')
+
+# Fixture name -> file or directory name
+FIXTURES = {
+    'proteins': 'proteins.faa',
+    'cds': 'cds.fna',
+    'codon_table': 'codons.cut',
+    'lengths': 'proteins_length.csv',
+    'iupred': 'proteins_iupred3_output.txt',
+    'phobius': 'proteins_tm.phobius',
+    'species': 'Synthetic_species',
+    'mgf': 'spectra.mgf',
+    'kallisto': 'kallisto_runs',
+}
+
+
+def instability_command(inputs, output_dir):
+    return [sys.executable, os.path.join(PANGENOME_DIR, 'calculate_instability.py'),
+            inputs['proteins'], os.path.join(output_dir, 'instability.csv')]
+
+
+def cai_command(inputs, output_dir):
+    return [sys.executable, os.path.join(PANGENOME_DIR, 'calculate_cai.py'), inputs['cds'],
+            os.path.join(output_dir, 'cai.csv'), '--codon-table', inputs['codon_table']]
+
+
+def disorder_command(inputs, output_dir):
+    return [sys.executable, os.path.join(PANGENOME_DIR, 'calculate_disorder.py'),
+            inputs['proteins'], inputs['iupred'], os.path.join(output_dir, 'disorder.csv')]
+
+
+def phobius_command(inputs, output_dir):
+    return [sys.executable, os.path.join(PANGENOME_DIR, 'parse_phobius.py'), inputs['phobius'],
+            '--tm', os.path.join(output_dir, 'tm.csv'), '--sp', os.path.join(output_dir, 'sp.csv'),
+            '--tm-coverage', os.path.join(output_dir, 'tm_coverage.csv'), '--lengths', inputs['lengths']]
+
+
+def conservation_command(inputs, output_dir):
+    # Drop the persisted clusters.tsv index so the benchmark measures building it
+    clusters_file = os.path.join(inputs['species'], 'Synthetic_species_proteins', 'clustering', 'clusters.tsv')
+    index_path = clusters_file + '.index.npz'
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); "
+            "from conservation_percentage_calculations import calculate_conservation; calculate_conservation(sys.argv[2])")
+    return [sys.executable, '-c', code, PANGENOME_DIR, inputs['species']]
+
+
+def retention_command(inputs, output_dir):
+    return [sys.executable, os.path.join(PROTEOMICS_DIR, 'retention_data_extractor.py'),
+            inputs['mgf'], os.path.join(output_dir, 'retention.txt')]
+
+
+def kallisto_command(inputs, output_dir):
+    return [sys.executable, os.path.join(KALLISTO_DIR, 'kallisto_counts_table.py'),
+            '--run-dir', inputs['kallisto'], '--output-dir', output_dir]
+
+
+# Benchmark name -> (fixtures it reads, command builder)
+BENCHMARKS = {
+    'instability': (['proteins'], instability_command),
+    'cai': (['cds', 'codon_table'], cai_command),
+    'disorder': (['proteins', 'iupred'], disorder_command),
+    'phobius': (['phobius', 'lengths'], phobius_command),
+    'conservation': (['species'], conservation_command),
+    'retention': (['mgf'], retention_command),
+    'kallisto': (['kallisto'], kallisto_command),
+}
+
+
+def ensure_fixture(fixture_dir, name, num_records, seed):
+    """Return the path of a fixture, generating it on first use.
+
+    Generation runs in its own process: a forked child inherits the parent's
+    peak RSS, so the runner itself has to stay small for ru_maxrss to be meaningful.
+    """
+    scale_dir = os.path.join(fixture_dir, f"{num_records}_seed{seed}")
+    path = os.path.join(scale_dir, FIXTURES[name])
+    marker = path + '.complete'
+    if not os.path.exists(marker):
+        os.makedirs(scale_dir, exist_ok=True)
+        print(f"Generating {name} fixture ({num_records} records) in {scale_dir}", file=sys.stderr)
+        subprocess.run([sys.executable, FIXTURES_SCRIPT, name, path, str(num_records), '--seed', str(seed)], check=True)
+        open(marker, 'w').close()
+    return path
+
+
+def path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def measure(command):
+    """Run a command, returning (exit code, wall seconds, user+system CPU seconds, peak RSS in MB)."""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    # wait4 reports this child's own resource usage, unlike RUSAGE_CHILDREN
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    max_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return process.returncode, seconds, usage.ru_utime + usage.ru_stime, max_rss_mb
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', '-C', REPO_DIR, 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', '-C', REPO_DIR, 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def run_benchmarks(benchmarks, scales, results_path, fixture_dir, seed=0, repeat=1):
+    commit = git_commit()
+    failures = 0
+    with open(results_path, 'a') as results:
+        for scale in scales:
+            num_records = SCALES[scale]
+            for name in benchmarks:
+                fixture_names, build_command = BENCHMARKS[name]
+                inputs = {fixture: ensure_fixture(fixture_dir, fixture, num_records, seed) for fixture in fixture_names}
+                input_bytes = sum(path_size(path) for path in inputs.values())
+                for run in range(repeat):
+                    output_dir = os.path.join(fixture_dir, f"{num_records}_seed{seed}", f"output_{name}")
+                    shutil.rmtree(output_dir, ignore_errors=True)
+                    os.makedirs(output_dir)
+                    exit_code, seconds, cpu_seconds, max_rss_mb = measure(build_command(inputs, output_dir))
+                    failures += exit_code != 0
+                    record = {
+                        'benchmark': name, 'scale': scale, 'records': num_records, 'seed': seed, 'run': run,
+                        'commit': commit, 'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                        'exit_code': exit_code, 'seconds': round(seconds, 4), 'cpu_seconds': round(cpu_seconds, 4),
+                        'records_per_second': round(num_records / seconds, 1),
+                        'input_mb': round(input_bytes / 1e6, 3), 'mb_per_second': round(input_bytes / 1e6 / seconds, 3),
+                        'max_rss_mb': round(max_rss_mb, 1),
+                        'python': platform.python_version(), 'host': platform.node(), 'cpus': os.cpu_count(),
+                    }
+                    results.write(json.dumps(record) + '\n')
+                    results.flush()
+                    status = 'ok' if exit_code == 0 else f'FAILED ({exit_code})'
+                    print(f"{name:<13} {scale:>4}  {seconds:9.3f} s  {record['records_per_second']:>12,.0f} rec/s  "
+                          f"{max_rss_mb:8.1f} MB  {status}")
+    return failures
+
+
+def compare(results_path, commits=None):
+    """Print the median time and peak RSS of each benchmark and scale, one column pair per commit."""
+    groups = {}
+    order = []
+    with open(results_path, 'r') as results:
+        for line in results:
+            record = json.loads(line)
+            if record['exit_code'] != 0 or (commits and record['commit'] not in commits):
+                continue
+            if record['commit'] not in order:
+                order.append(record['commit'])
+            groups.setdefault((record['benchmark'], record['records']), {}).setdefault(record['commit'], []).append(record)
+
+    columns = commits or order
+    print('benchmark\trecords\t' + '\t'.join(f"{commit} s\t{commit} MB" for commit in columns))
+    for (name, num_records), by_commit in sorted(groups.items()):
+        cells = []
+        for commit in columns:
+            runs = by_commit.get(commit)
+            if runs:
+                cells.append(f"{statistics.median(run['seconds'] for run in runs):.3f}")
+                cells.append(f"{max(run['max_rss_mb'] for run in runs):.1f}")
+            else:
+                cells.extend(['-', '-'])
+        print(f"{name}\t{num_records}\t" + '\t'.join(cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline scripts on synthetic inputs.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run benchmarks and append the results")
+    run_parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    run_parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['1k', '10k'])
+    run_parser.add_argument('--repeat', type=int, default=3, help="Runs per benchmark and scale")
+    run_parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic inputs")
+    run_parser.add_argument('--results', default=DEFAULT_RESULTS, help="JSON-lines file the results are appended to")
+    run_parser.add_argument('--fixture-dir', default=DEFAULT_FIXTURE_DIR, help="Where generated inputs are cached")
+
+    compare_parser = subparsers.add_parser('compare', help="Compare results across commits")
+    compare_parser.add_argument('--results', default=DEFAULT_RESULTS)
+    compare_parser.add_argument('--commits', nargs='+', help="Commits to show, in order (default: all)")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        failures = run_benchmarks(args.benchmarks, args.scales, args.results, args.fixture_dir, args.seed, args.repeat)
+        sys.exit(1 if failures else 0)
+    compare(args.results, args.commits)
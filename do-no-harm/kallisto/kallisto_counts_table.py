@@ -1,40 +1,103 @@
 #!/usr/bin/env python3
 
-import csv
+import argparse
+import hashlib
 import os
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
 
 # Define the array of kmers
 kmers = [7, 11, 15, 19, 23, 27, 31]
 
-# Process the abundance files and create the counts table
-for kmer in kmers:
-    output_filename = f'run{kmer}_counts_table.csv'
-    sample_counts = defaultdict(lambda: defaultdict(int))  # Nested dictionary for counts
-    samples = []
-
-    # Search for directories and process files
-    for dir_entry in os.scandir():
-        if dir_entry.is_dir() and f'_run{kmer}' in dir_entry.name:
-            sample_name = dir_entry.name.split('_run')[0]
-            samples.append(sample_name)
-            file_path = os.path.join(dir_entry.path, 'abundance.tsv')
-
-            with open(file_path, 'r') as tsvfile:
-                reader = csv.DictReader(tsvfile, delimiter='\t')
-                for row in reader:
-                    target_id = row['target_id']
-                    est_counts = float(row['est_counts'])
-                    sample_counts[target_id][sample_name] = est_counts
-
-    # Write to the output CSV file
-    with open(output_filename, 'w', newline='') as csvfile:
-        fieldnames = ['target_id'] + samples
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for target_id in sample_counts:
-            row = {'target_id': target_id}
-            for sample in samples:
-                row[sample] = sample_counts[target_id].get(sample, 0)
-            writer.writerow(row)
+def read_abundance(file_path):
+    # Read only the two columns we need; round_trip keeps the counts identical to float()
+    abundance = pd.read_csv(file_path, sep='\t', usecols=['target_id', 'est_counts'],
+                            dtype={'target_id': str, 'est_counts': np.float64}, float_precision='round_trip')
+    return abundance['target_id'].to_numpy(), abundance['est_counts'].to_numpy()
+
+def read_target_ids(file_path):
+    return pd.read_csv(file_path, sep='\t', usecols=['target_id'], dtype={'target_id': str})['target_id'].to_numpy()
+
+def target_digest(target_ids):
+    return hashlib.sha1('\n'.join(target_ids).encode()).hexdigest()
+
+def read_counts(file_path, reference_digest):
+    """Return a file's est_counts, plus its target IDs only when they differ from the k-mer's reference list."""
+    target_ids, est_counts = read_abundance(file_path)
+    if target_digest(target_ids) == reference_digest:
+        return None, est_counts
+    return target_ids, est_counts
+
+def find_runs(run_dir, kmers):
+    """Scan run_dir once and group the sample directories by k-mer, in directory order."""
+    dir_names = [entry.name for entry in os.scandir(run_dir) if entry.is_dir()]
+    runs = {}
+    for kmer in kmers:
+        runs[kmer] = [(name.split('_run')[0], os.path.join(run_dir, name, 'abundance.tsv'))
+                      for name in dir_names if f'_run{kmer}' in name]
+    return runs
+
+def build_counts_table(samples, reference_ids, counts_by_file):
+    """Assemble one k-mer's counts as a dense targets x samples table over the shared target index.
+
+    counts_by_file holds (target_ids, est_counts) per sample, with target_ids None
+    for files listing exactly the reference targets in the same order.
+    """
+    # Targets in order of first appearance: the reference file's, then any only other files list
+    targets = pd.Index(pd.unique(np.concatenate([reference_ids] + [target_ids for target_ids, _ in counts_by_file
+                                                                   if target_ids is not None])))
+    reference_rows = targets.get_indexer(reference_ids)
+    unique_samples = list(dict.fromkeys(samples))
+    # Targets missing from a sample stay NaN and are written as 0
+    counts = np.full((len(targets), len(unique_samples)), np.nan, dtype=np.float64)
+    for sample, (target_ids, est_counts) in zip(samples, counts_by_file):
+        rows = reference_rows if target_ids is None else targets.get_indexer(target_ids)
+        counts[rows, unique_samples.index(sample)] = est_counts
+
+    table = pd.DataFrame(counts, index=targets, columns=unique_samples)
+    table.index.name = 'target_id'
+    # A sample listed twice (e.g. run23 and run23_default) keeps its column twice, as before
+    return table[samples]
+
+def write_counts_table(table, output_filename, file_format):
+    if file_format == 'csv':
+        table.to_csv(output_filename, na_rep='0', lineterminator='\r\n')
+    else:
+        # Columnar files need unique column names, so a repeated sample is stored once
+        table = table.loc[:, ~table.columns.duplicated()]
+        table.fillna(0).reset_index().to_parquet(output_filename, index=False, compression='zstd')
+    return table
+
+def build_all_counts_tables(run_dir, kmers, workers, file_format, output_dir='.'):
+    runs = find_runs(run_dir, kmers)
+
+    # One k-mer's table is built, written and freed before the next is read
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for kmer in kmers:
+            samples = [sample for sample, _ in runs[kmer]]
+            file_paths = [file_path for _, file_path in runs[kmer]]
+            # Every sample of a k-mer normally lists the same targets in the same order, so workers
+            # only send back their counts once the IDs match the first file's
+            reference_ids = read_target_ids(file_paths[0]) if file_paths else np.array([], dtype=object)
+            reference_digest = target_digest(reference_ids)
+            counts_by_file = list(executor.map(read_counts, file_paths, repeat(reference_digest), chunksize=4))
+
+            table = build_counts_table(samples, reference_ids, counts_by_file)
+            del counts_by_file
+            output_filename = os.path.join(output_dir, f'run{kmer}_counts_table.{file_format}')
+            table = write_counts_table(table, output_filename, file_format)
+            print(f"Wrote {output_filename}: {table.shape[0]} targets x {table.shape[1]} samples")
+            del table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build one counts table per k-mer from kallisto abundance.tsv files.")
+    parser.add_argument('--run-dir', default='.', help="Directory containing the <sample>_run<k> kallisto output directories")
+    parser.add_argument('--kmers', type=int, nargs='+', default=kmers, help="k-mer sizes to build tables for")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of abundance files parsed at once")
+    parser.add_argument('--output-dir', default='.', help="Directory the run<k>_counts_table files are written to")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="Output format (parquet is zstd-compressed)")
+    args = parser.parse_args()
+
+    build_all_counts_tables(args.run_dir, args.kmers, args.workers, args.format, args.output_dir)
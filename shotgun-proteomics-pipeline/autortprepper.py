@@ -1,10 +1,42 @@
 import sys
 import pandas as pd
 
-def preprocess_peptide(peptide):
-    # Remove modification information for C and replace modified M with 1
-    peptide = peptide.replace('+57.021', '').replace('M+15.995', '1')
-    return peptide
+# Rows of the MS-GF+ and retention time files read at a time
+CHUNK_ROWS = 500000
+TEST_COUNT = 1000
+
+def preprocess_peptides(peptides):
+    # Remove modification information for C and replace modified M with 1, over a Series of peptides
+    return peptides.str.replace('+57.021', '', regex=False).str.replace('M+15.995', '1', regex=False)
+
+def read_msgf_peptides(input_msgf_file, test_count=TEST_COUNT):
+    """Stream the MS-GF+ TSV, returning the first test_count peptides passing the Q-value cutoff and the number that pass."""
+    test_peptides = []
+    num_passing = 0
+    for chunk in pd.read_csv(input_msgf_file, sep='\t', usecols=['Peptide', 'QValue'],
+                             dtype={'Peptide': str, 'QValue': 'float64'}, chunksize=CHUNK_ROWS):
+        # Filter rows based on Q-value
+        peptides = chunk.loc[chunk['QValue'] < 0.01, 'Peptide']
+        num_passing += len(peptides)
+        if len(test_peptides) < test_count:
+            test_peptides.extend(preprocess_peptides(peptides.iloc[:test_count - len(test_peptides)]).tolist())
+    return test_peptides, num_passing
+
+def split_retention_data(input_retention_file, test_peptides, training_count, test_output_file, training_output_file):
+    # Hash the test peptides once; the same lookup splits every chunk into test and training rows
+    test_index = pd.Index(test_peptides).unique()
+    training_remaining = training_count
+    with open(test_output_file, 'w') as test_file, open(training_output_file, 'w') as training_file:
+        test_file.write('x\ty\n')
+        training_file.write('x\ty\n')
+        for chunk in pd.read_csv(input_retention_file, sep='\t', header=None, names=['Peptide', 'RetentionTime'],
+                                 dtype=str, chunksize=CHUNK_ROWS):
+            in_test = test_index.get_indexer(chunk['Peptide']) >= 0
+            chunk[in_test].to_csv(test_file, sep='\t', header=False, index=False)
+            if training_remaining > 0:
+                training_rows = chunk[~in_test].head(training_remaining)
+                training_rows.to_csv(training_file, sep='\t', header=False, index=False)
+                training_remaining -= len(training_rows)
 
 def main():
     # Check if the correct number of command line arguments are provided
@@ -18,33 +50,15 @@ def main():
     test_output_file = sys.argv[3]
     training_output_file = sys.argv[4]
 
-    # Read the MSGF file
-    msgf_df = pd.read_csv(input_msgf_file, sep='\t', comment='#')
-
-    # Filter rows based on Q-value
-    filtered_df = msgf_df[msgf_df.iloc[:, 15] < 0.01]
+    # Extract the test peptides and count the rows passing the Q-value filter
+    test_peptides, num_passing = read_msgf_peptides(input_msgf_file)
 
     # Ensure we don't exceed the available count
-    test_count = min(1000, len(filtered_df))
-    training_count = max(0, len(filtered_df) - test_count)
-
-    # Extract peptides and preprocess
-    test_peptides = filtered_df.iloc[:test_count, 9].apply(preprocess_peptide).tolist()
-
-    # Read the retention time file
-    retention_df = pd.read_csv(input_retention_file, sep='\t', header=None, names=['Peptide', 'RetentionTime'])
-
-    # Filter rows based on test peptides
-    test_retention_df = retention_df[retention_df['Peptide'].isin(test_peptides)]
-
-    # Write test file
-    test_retention_df.to_csv(test_output_file, sep='\t', columns=['Peptide', 'RetentionTime'], header=['x','y'], index=False)
-
-    # Filter rows based on training peptides
-    training_retention_df = retention_df[~retention_df['Peptide'].isin(test_peptides)].head(training_count)
+    test_count = min(TEST_COUNT, num_passing)
+    training_count = max(0, num_passing - test_count)
 
-    # Write training file
-    training_retention_df.to_csv(training_output_file, sep='\t', columns=['Peptide', 'RetentionTime'], header=['x','y'], index=False)
+    # Write the test and training files from a single pass over the retention time file
+    split_retention_data(input_retention_file, test_peptides, training_count, test_output_file, training_output_file)
 
 if __name__ == "__main__":
     main()
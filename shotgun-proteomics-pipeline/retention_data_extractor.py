@@ -1,61 +1,99 @@
-import sys
+import argparse
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+OXIDATION = re.compile(r'(\d+)-\[Oxidation')
 
 def replace_modified_m(sequence, modification_info):
-    modified_positions = [int(match.group(1)) for match in re.finditer(r'(\d+)-\[Oxidation', modification_info)]
+    modified_positions = [int(match.group(1)) for match in OXIDATION.finditer(modification_info)]
     sequence_list = list(sequence)
     for position in modified_positions:
         sequence_list[position - 1] = '1'
     return ''.join(sequence_list)
 
-def filter_retention_times(peptide_data):
-    filtered_data = {}
-    for sequence, rt_values in peptide_data.items():
-        if len(rt_values) == 1:
-            filtered_data[sequence] = rt_values[0]
+def iter_retention_times(input_filename):
+    """Yield (sequence, retention time in seconds) for each spectrum of an MGF file, one line at a time.
+
+    As before, only USER03 lines between SEQ= and RTINSECONDS= are read, and a
+    spectrum without one reuses the previous spectrum's modification info.
+    """
+    modification_info = ''
+    sequence = None
+    with open(input_filename, 'r') as input_file:
+        for line in input_file:
+            if sequence is None:
+                if line.startswith("SEQ="):
+                    sequence = line.split('=')[1].strip()
+            elif line.startswith("USER03="):
+                modification_info = line.split('=')[1].strip()
+            elif line.startswith("RTINSECONDS="):
+                rt_seconds = float(line.split('=')[1].strip())
+                yield replace_modified_m(sequence, modification_info), rt_seconds
+                sequence = None
+
+def retention_stats(input_filename):
+    """Aggregate retention times per peptide as [min, max, sum, count]."""
+    peptide_stats = {}
+    for sequence, rt_seconds in iter_retention_times(input_filename):
+        stats = peptide_stats.get(sequence)
+        if stats is None:
+            peptide_stats[sequence] = [rt_seconds, rt_seconds, rt_seconds, 1]
         else:
-            rt_values.sort()
-            min_rt = rt_values[0]
-            max_rt = rt_values[-1]
-            if max_rt - min_rt <= 180:
-                avg_rt = sum(rt_values) / len(rt_values)
-                filtered_data[sequence] = avg_rt
+            if rt_seconds < stats[0]:
+                stats[0] = rt_seconds
+            if rt_seconds > stats[1]:
+                stats[1] = rt_seconds
+            stats[2] += rt_seconds
+            stats[3] += 1
+    return peptide_stats
+
+def merge_retention_stats(all_stats):
+    """Merge per-file statistics, keeping peptides in order of first appearance across the files."""
+    merged = {}
+    for peptide_stats in all_stats:
+        for sequence, (min_rt, max_rt, total_rt, count) in peptide_stats.items():
+            stats = merged.get(sequence)
+            if stats is None:
+                merged[sequence] = [min_rt, max_rt, total_rt, count]
+            else:
+                stats[0] = min(stats[0], min_rt)
+                stats[1] = max(stats[1], max_rt)
+                stats[2] += total_rt
+                stats[3] += count
+    return merged
+
+def filter_retention_times(peptide_stats):
+    filtered_data = {}
+    for sequence, (min_rt, max_rt, total_rt, count) in peptide_stats.items():
+        if count == 1:
+            filtered_data[sequence] = min_rt
+        elif max_rt - min_rt <= 180:
+            filtered_data[sequence] = total_rt / count
     return filtered_data
 
-def retention_data(input_filename, output_filename):
-    with open(input_filename, 'r') as input_file:
-        lines = input_file.readlines()
-        i = 0
-        peptide_data = {}
-
-        while i < len(lines):
-            if lines[i].startswith("SEQ="):
-                sequence = lines[i].split('=')[1].strip()
-                i += 1
-                while i < len(lines) and not lines[i].startswith("RTINSECONDS="):
-                    if lines[i].startswith("USER03="):
-                        modification_info = lines[i].split('=')[1].strip()
-                    i += 1
-                if i < len(lines) and lines[i].startswith("RTINSECONDS="):
-                    rt_seconds = float(lines[i].split('=')[1].strip())
-                    sequence = replace_modified_m(sequence, modification_info)
-                    
-                    if sequence not in peptide_data:
-                        peptide_data[sequence] = [rt_seconds]
-                    else:
-                        peptide_data[sequence].append(rt_seconds)
-            i += 1
-
-    filtered_peptide_data = filter_retention_times(peptide_data)
+def retention_data(input_filenames, output_filename, workers=None):
+    if isinstance(input_filenames, str):
+        input_filenames = [input_filenames]
+
+    if len(input_filenames) == 1:
+        all_stats = [retention_stats(input_filenames[0])]
+    else:
+        # Each MGF file is parsed in its own process; results come back in input order
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            all_stats = list(executor.map(retention_stats, input_filenames))
+
+    filtered_peptide_data = filter_retention_times(merge_retention_stats(all_stats))
 
     with open(output_filename, 'w') as output_file:
         for sequence, rt_value in filtered_peptide_data.items():
             output_file.write(f"{sequence}\t{rt_value}\n")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python3 retention_data_extractor.py input_file.mgf output_file.txt")
-    else:
-        input_filename = sys.argv[1]
-        output_filename = sys.argv[2]
-        retention_data(input_filename, output_filename)
+    parser = argparse.ArgumentParser(description="Extract per-peptide retention times from one or more MGF files.")
+    parser.add_argument('input_files', nargs='+', help="Input MGF file(s); retention times are pooled across all of them")
+    parser.add_argument('output_file', help="Output peptide<TAB>retention time file")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of MGF files parsed at once")
+    args = parser.parse_args()
+
+    retention_data(args.input_files, args.output_file, args.workers)
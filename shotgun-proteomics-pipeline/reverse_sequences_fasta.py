@@ -1,31 +1,88 @@
-# generates a reversed sequence fasta file from a normal one
-# (to make decoy sequences)
-
-def reverse_sequences():
-    # Prompt for input and output file paths
-    input_file = input("Enter the input file path: ")
-    output_file = input("Enter the output file path: ")
-
-    # Read the input file
-    with open(input_file, 'r') as f:
-        lines = f.readlines()
-
-    # Parse the sequences and reverse them
-    sequences = {}
-    current_seq = ''
-    for line in lines:
-        line = line.strip()
-        if line.startswith('>'):
-            current_seq = line
-            sequences[current_seq] = ''
-        else:
-            sequences[current_seq] += line[::-1]
-
-    # Write the reversed sequences to the output file
-    with open(output_file, 'w') as f:
-        for seq, rev_seq in sequences.items():
-            f.write('{}\n{}\n'.format(seq, rev_seq))
-
-
-# Call the function to reverse the sequences
-reverse_sequences()
+# generates a concatenated target + decoy (reversed, pseudo-reversed or shuffled) sequence fasta file
+# from a normal one, or the decoys alone with --decoys-only
+
+import argparse
+import random
+import re
+
+WRITE_BUFFER_BYTES = 4 * 1024 * 1024
+# Runs of residues between trypsin cleavage sites
+BETWEEN_CLEAVAGE_SITES = re.compile(rb'[^KR]+')
+
+def read_fasta(path):
+    """Yield (header line without '>', sequence bytes) one record at a time; duplicate headers are kept."""
+    header = None
+    chunks = []
+    with open(path, 'rb') as file:
+        for line in file:
+            if line.startswith(b'>'):
+                if header is not None:
+                    yield header, b''.join(chunks)
+                header = line[1:].rstrip()
+                chunks = []
+            elif header is not None:
+                chunks.append(line.strip())
+    if header is not None:
+        yield header, b''.join(chunks)
+
+def reverse_sequence(sequence, rng=None):
+    return sequence[::-1]
+
+def pseudo_reverse_sequence(sequence, rng=None):
+    # Reverse the residues between K/R so every cleavage site stays where it was
+    return BETWEEN_CLEAVAGE_SITES.sub(lambda match: match.group()[::-1], sequence)
+
+def shuffle_sequence(sequence, rng):
+    # Shuffle the residues between K/R so every cleavage site stays where it was
+    return BETWEEN_CLEAVAGE_SITES.sub(lambda match: bytes(rng.sample(match.group(), len(match.group()))), sequence)
+
+DECOY_METHODS = {
+    'reverse': reverse_sequence,
+    'pseudo-reverse': pseudo_reverse_sequence,
+    'shuffle': shuffle_sequence,
+}
+
+def write_decoy_database(input_file, output_file, method='reverse', decoy_prefix='XXX_', concatenate=True, seed=0):
+    """Write one decoy per input protein, after the unchanged targets unless concatenate is False.
+
+    Returns the number of decoy sequences written.
+    """
+    make_decoy = DECOY_METHODS[method]
+    rng = random.Random(seed)
+    prefix = decoy_prefix.encode()
+    buffer = []
+    buffered = 0
+    num_decoys = 0
+    with open(output_file, 'wb') as output:
+        def write_record(header, sequence):
+            nonlocal buffered
+            buffer.append(b'>' + header + b'\n' + sequence + b'\n')
+            buffered += len(sequence) + len(header) + 3
+            if buffered >= WRITE_BUFFER_BYTES:
+                output.write(b''.join(buffer))
+                buffer.clear()
+                buffered = 0
+
+        # Targets first, then a second streaming pass for the decoys
+        if concatenate:
+            for header, sequence in read_fasta(input_file):
+                write_record(header, sequence)
+        for header, sequence in read_fasta(input_file):
+            write_record(prefix + header, make_decoy(sequence, rng))
+            num_decoys += 1
+        output.write(b''.join(buffer))
+    return num_decoys
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a decoy protein database from a target FASTA file.")
+    parser.add_argument('input_file', help="Target protein FASTA")
+    parser.add_argument('output_file', help="Output target+decoy (or decoy-only) FASTA")
+    parser.add_argument('--method', choices=list(DECOY_METHODS), default='reverse',
+                        help="reverse whole proteins, or reverse/shuffle them between K/R cleavage sites")
+    parser.add_argument('--decoy-prefix', default='XXX_', help="Prefix added to decoy headers (use '' to keep the target headers)")
+    parser.add_argument('--decoys-only', action='store_true', help="Write only the decoys, without the target sequences before them")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for --method shuffle")
+    args = parser.parse_args()
+
+    num_decoys = write_decoy_database(args.input_file, args.output_file, args.method, args.decoy_prefix, not args.decoys_only, args.seed)
+    print(f"Wrote {num_decoys} decoy sequences to {args.output_file}")